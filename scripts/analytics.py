@@ -0,0 +1,173 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from read_queries import query
+from cache import data_generation, frame_nbytes
+from engine import rounds_half_to_even
+from metrics import metrics
+from snapshot import daily_facts, snapshot_available
+
+# Period column produced by the *_account_amounts queries for each view
+PERIOD_COLUMNS = {"monthly": "month", "weekly": "week", "daily": "day"}
+
+def _round(values, half_to_even):
+    # The database's ROUND() of a double: ties to even on PostgreSQL (as np.round does), away
+    # from zero on DuckDB and SQLite
+    if half_to_even:
+        return np.round(values)
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+def _frame(series, value_name):
+    # Same shape as query() results: plain (non-categorical) columns and a 1-based index
+    df = series.reset_index(name=value_name)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    df.index = range(1, len(df) + 1)
+    return df
+
+def _month_label(months):
+    # TO_CHAR(month, 'FMMonth YYYY')
+    return months.dt.strftime('%B %Y')
+
+class FactCube:
+    # In-memory day x account x category x type aggregate of transactions. Every dashboard
+    # widget is derived from it with vectorized groupbys, so one query feeds the whole tab and
+    # sidebar changes re-slice it without touching the database.
+
+    def __init__(self, facts, half_to_even=None):
+        # half_to_even: the rounding rule of the database the SQL versions run on (default: the app's)
+        self.half_to_even = rounds_half_to_even() if half_to_even is None else half_to_even
+        facts = facts.copy()
+        facts['day'] = pd.to_datetime(facts['day'])
+        for column in ('account', 'category', 'type'):
+            facts[column] = facts[column].astype('category')
+        self.facts = facts
+        self._periods = {
+            "daily": facts['day'],
+            # DATE_TRUNC('week') starts on Monday; the dashboard labels weeks by their last day
+            "weekly": facts['day'] - pd.to_timedelta(facts['day'].dt.weekday, unit='D') + pd.Timedelta(days=6),
+            "monthly": facts['day'].dt.to_period('M').dt.to_timestamp(),
+        }
+
+    @classmethod
+    def load(cls):
+        # From the memory-mapped snapshot when there is one, else from the database
+        if snapshot_available():
+            try:
+                start = time.perf_counter()
+                facts = daily_facts()
+                metrics.record_query("fact_cube", time.perf_counter() - start, len(facts), frame_nbytes(facts), "snapshot")
+                return cls(facts)
+            except Exception as e:
+                print(f"Error reading the transactions snapshot: {str(e)}")
+        return cls(query("fact_cube"))
+
+    def _of_type(self, kind):
+        return self.facts['type'] == kind
+
+    def account_amounts(self, view):
+        # Long-format period x account sums, same as the *_account_amounts queries
+        period = PERIOD_COLUMNS[view]
+        sums = self.facts['rounded_amount'].groupby(
+            [self._periods[view].rename(period), self.facts['account']], dropna=False, observed=True
+        ).sum()
+        return _frame(sums, 'amount')
+
+    def expenses(self, view):
+        # monthly_expenses / weekly_expenses / daily_expenses
+        period = PERIOD_COLUMNS[view]
+        mask = self._of_type('expense')
+        sums = self.facts.loc[mask, 'amount'].groupby(self._periods[view][mask].rename(period)).sum().sort_index()
+        df = _frame(_round(sums.abs(), self.half_to_even), 'expenses')
+        if view == "monthly":
+            df['month'] = _month_label(df['month'])
+        return df
+
+    def cash_flow(self):
+        # monthly_cash_flow: income minus expenses per month
+        amount = self.facts['amount']
+        signed = amount.where(self._of_type('income'), 0) - amount.where(self._of_type('expense'), 0)
+        sums = signed.groupby(self._periods["monthly"].rename('month')).sum().sort_index()
+        df = _frame(sums, 'cash_flow')
+        df['month'] = _month_label(df['month'])
+        return df
+
+    def per_category(self, kind, value_name):
+        # expenses_per_category / income_per_category
+        sums = self.facts['amount'].where(self._of_type(kind), 0).groupby(
+            self.facts['category'], dropna=False, observed=True
+        ).sum()
+        sums = sums[sums != 0]
+        return _frame(_round(sums.abs(), self.half_to_even).sort_values(ascending=False), value_name)
+
+    def methods(self, kind):
+        # payment_methods / receiving_methods
+        mask = self._of_type(kind)
+        sums = self.facts.loc[mask, 'amount'].groupby(
+            self.facts.loc[mask, 'account'], dropna=False, observed=True
+        ).sum()
+        return _frame(_round(sums.abs(), self.half_to_even).sort_values(ascending=False), 'amount')
+
+# Dashboard queries that can be answered from the fact cube instead of the database
+CUBE_VIEWS = {
+    "monthly_expenses": lambda cube: cube.expenses("monthly"),
+    "weekly_expenses": lambda cube: cube.expenses("weekly"),
+    "daily_expenses": lambda cube: cube.expenses("daily"),
+    "monthly_cash_flow": lambda cube: cube.cash_flow(),
+    "expenses_per_category": lambda cube: cube.per_category("expense", "expenses"),
+    "income_per_category": lambda cube: cube.per_category("income", "income"),
+    "payment_methods": lambda cube: cube.methods("expense"),
+    "receiving_methods": lambda cube: cube.methods("income"),
+}
+
+_cube = None
+_cube_generation = None
+_cube_lock = threading.Lock()
+
+def get_fact_cube():
+    # One cube per data generation, shared by every session until the next load/drop
+    global _cube, _cube_generation
+    generation = data_generation()
+    with _cube_lock:
+        if _cube is None or _cube_generation != generation:
+            _cube = FactCube.load()
+            _cube_generation = generation
+        return _cube
+
+def dashboard_frame(query_name, cube=None):
+    if cube is not None and query_name in CUBE_VIEWS:
+        start = time.perf_counter()
+        df = CUBE_VIEWS[query_name](cube)
+        metrics.record_query(query_name, time.perf_counter() - start, len(df), frame_nbytes(df), "cube")
+        return df
+    return query(query_name)
+
+def amount_over_time(view, cube=None):
+    # Running balance per account. One long-format period x account aggregate is pivoted and
+    # cumulatively summed in pandas, so every account in the data gets a column
+    # (plus 'net_worth', the running total over all accounts).
+    period = PERIOD_COLUMNS[view]
+    amounts = cube.account_amounts(view) if cube is not None else query(f"{view}_account_amounts")
+    if amounts.empty:
+        return pd.DataFrame(columns=[period, 'net_worth'])
+
+    # Large results come back with a categorical account column; pivot on plain labels
+    amounts['account'] = amounts['account'].astype(object).fillna('(no account)')
+    balances = (
+        amounts.pivot(index=period, columns='account', values='amount')
+        .fillna(0)
+        .sort_index()
+        .cumsum()
+    )
+    balances.insert(0, 'net_worth', balances.sum(axis=1))
+    balances.columns.name = None
+    balances = balances.reset_index()
+    balances.index = range(1, len(balances) + 1)
+    return balances
+
+def account_columns(balances):
+    # Series that can be plotted from an amount_over_time() result, with net_worth last
+    accounts = sorted(c for c in balances.columns[1:] if c != 'net_worth')
+    return accounts + ['net_worth']
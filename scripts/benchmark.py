@@ -0,0 +1,549 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import sqlalchemy
+from sqlalchemy import text
+from read_queries import QUERIES_PATH, QueryCatalog, with_implicit_params
+from database import (TABLE_INDEXES, assign_row_ids, card_account_flags, copy_load, extract, extract_files,
+                      ingest_files, load, partition_load, refresh_rollups, table_partitions, transform)
+from engine import embedded_connection_uri, get_connection_uri, get_engine
+from cache import frame_nbytes, result_cache
+from snapshot import daily_facts, drop_snapshot, transactions_by_date
+
+# --- MICRO-BENCHMARKS ---
+# Run from the repository root, e.g. `python scripts/benchmark.py catalog`.
+# Database benchmarks (load, explain, partition) write to the tables the app reads, so point
+# --uri / SPENDSENSE_DATABASE_URI at a scratch database.
+# `etl` is the end-to-end suite: it generates a seeded Bluecoins export and runs against a
+# throwaway embedded database unless --uri is given. Compare two --output files with
+# `python scripts/benchmark.py compare --files baseline.json candidate.json`.
+
+def legacy_read_query(query_name, path=QUERIES_PATH):
+    # Previous read_queries.read_query(): open and split the whole file on every call
+    with open(path, 'r') as file:
+        content = file.read()
+
+    queries = [q.strip() for q in content.split('--@name:')]
+    for q in queries:
+        lines = q.split('\n', 1)
+        name = lines[0].strip()
+        query = lines[1].strip() if len(lines) > 1 else ''
+        if name == query_name:
+            return query
+
+    raise ValueError(f"Query with name '{query_name}' not found in the file.")
+
+def best_of(stmt, number, repeat):
+    # Best-of-N per-call time in microseconds
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e6
+
+def bench_catalog(args):
+    catalog = QueryCatalog()
+    names = catalog.names()
+    results = []
+    for name in names:
+        results.append({
+            "query": name,
+            "legacy_us": best_of(lambda: legacy_read_query(name), args.number, args.repeat),
+            "catalog_us": best_of(lambda: catalog.statement(name), args.number, args.repeat),
+        })
+    for r in results:
+        r["speedup"] = r["legacy_us"] / r["catalog_us"] if r["catalog_us"] else None
+    return results
+
+def synthetic_transactions(rows, seed=0, end=None, void_share=0.0, years=5):
+    # Cleaned-transactions shaped frame (the output of database.transform) with random values;
+    # `void_share` of the rows get status 'Void' like deleted Bluecoins entries
+    rng = np.random.default_rng(seed)
+    # `years` of history ending `end` (default today, so CURRENT_DATE-relative queries find rows)
+    start = pd.Timestamp(end or pd.Timestamp.today()).normalize() - pd.DateOffset(years=years)
+    accounts = np.array(['Wallet', 'Union Bank', 'GCash', 'Maya', 'Seabank', 'Visa Credit Card'])
+    categories = np.array(['Food', 'Transport', 'Bills', 'Shopping', 'Salary', 'Allowance'])
+    types = rng.choice(np.array(['expense', 'income', 'transfer']), rows, p=[0.7, 0.2, 0.1])
+    amounts = rng.gamma(2.0, 250.0, rows).round(2)
+    df = pd.DataFrame({
+        'type': types,
+        'date': start + pd.to_timedelta(rng.integers(0, years * 365 * 24 * 3600, rows), unit='s'),
+        'item': np.char.add('item ', rng.integers(0, 5000, rows).astype(str)),
+        'amount': np.where(types == 'expense', -amounts, amounts),
+        'currency': 'INR',
+        'category': rng.choice(categories, rows),
+        'account': rng.choice(accounts, rows),
+        'status': 'Reconciled',
+    })
+    df['is_card'] = card_account_flags(df['account'])
+    if void_share:
+        df['status'] = np.where(rng.random(rows) < void_share, 'Void', 'Reconciled')
+    return df
+
+def to_bluecoins(df):
+    # Back to the Bluecoins export layout (the raw_transactions columns)
+    raw = df.drop(columns=['is_card']).rename(columns={
+        'type': 'Type', 'date': 'Date', 'item': 'Title', 'amount': 'Amount', 'currency': 'Currency',
+        'category': 'Category', 'account': 'Account', 'status': 'Status',
+    })
+    raw['Type'] = raw['Type'].str.capitalize()
+    return raw
+
+# Rows generated at a time when writing an export, so 10M-row files never sit in memory at once
+GENERATE_BLOCK_ROWS = 1_000_000
+# Share of entries marked Void (dropped by transform)
+VOID_SHARE = 0.02
+
+def bluecoins_export(rows, seed=0, end=None):
+    # Bluecoins CSV layout: capitalized types, text dates and a few voided entries
+    raw = to_bluecoins(synthetic_transactions(rows, seed, end, VOID_SHARE))
+    raw['Date'] = raw['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return raw
+
+def write_bluecoins_csv(path, rows, seed=0, end=None):
+    # Same file for the same (rows, seed, end), written block by block with Arrow's CSV writer
+    # (DataFrame.to_csv is ~20x slower at these sizes)
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    writer = None
+    try:
+        for block, start in enumerate(range(0, max(rows, 1), GENERATE_BLOCK_ROWS)):
+            table = pa.Table.from_pandas(bluecoins_export(min(GENERATE_BLOCK_ROWS, rows - start), [seed, block], end), preserve_index=False)
+            if writer is None:
+                writer = pa_csv.CSVWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+def bench_generate(args):
+    # Write seeded Bluecoins exports (one file per --rows value) into --csv-dir
+    os.makedirs(args.csv_dir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        path = os.path.join(args.csv_dir, f"bluecoins_{rows}_seed{args.seed}.csv")
+        seconds = _wall_time(lambda: write_bluecoins_csv(path, rows, args.seed, args.end_date))
+        results.append({"rows": rows, "seed": args.seed, "path": path, "bytes": os.path.getsize(path), "seconds": seconds})
+    return results
+
+def legacy_transform(df):
+    # Previous database.transform(): every text column kept as Python string objects
+    cleaned_df = df.loc[df['Status'] == 'Reconciled', ['Type', 'Date', 'Title', 'Amount', 'Currency', 'Category', 'Account', 'Status']]
+    cleaned_df.columns = ['type', 'date', 'item', 'amount', 'currency', 'category', 'account', 'status']
+    cleaned_df['date'] = pd.to_datetime(cleaned_df['date'])
+    cleaned_df['type'] = cleaned_df['type'].str.lower().str.strip()
+    cleaned_df['amount'] = pd.to_numeric(cleaned_df['amount'], errors='coerce').fillna(0)
+    return cleaned_df
+
+def bench_memory(args):
+    # In-memory size of the extract and transform outputs with default dtypes vs. the typed schema,
+    # on a generated Bluecoins export
+    results = []
+    for rows in args.rows:
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            path = f.name
+        try:
+            write_bluecoins_csv(path, rows, args.seed, args.end_date)
+            legacy_raw = pd.read_csv(path)
+            legacy_clean = legacy_transform(legacy_raw)
+            typed_raw = extract(path)
+            typed_clean = transform(typed_raw)
+        finally:
+            os.remove(path)
+        result = {"rows": rows}
+        for stage, legacy, typed in (("extract", legacy_raw, typed_raw), ("transform", legacy_clean, typed_clean)):
+            result[stage] = {
+                "default_mib": frame_nbytes(legacy) / 2**20,
+                "typed_mib": frame_nbytes(typed) / 2**20,
+                "reduction": frame_nbytes(legacy) / frame_nbytes(typed),
+            }
+        results.append(result)
+    return results
+
+def bench_load(args):
+    # rows/sec of the COPY loader vs. the previous DataFrame.to_sql path (needs PostgreSQL)
+    db_engine = get_engine(args.uri or get_connection_uri())
+    results = []
+    for rows in args.rows:
+        df = synthetic_transactions(rows)
+        timings = {}
+        for method, run in (
+            ("to_sql", lambda: df.to_sql(name="bench_transactions", con=db_engine, if_exists="replace", index=False)),
+            ("copy", lambda: copy_load(df, "bench_transactions", db_engine)),
+        ):
+            best = min(_wall_time(run) for _ in range(args.repeat))
+            timings[method] = {"seconds": best, "rows_per_sec": rows / best}
+        timings["speedup"] = timings["to_sql"]["seconds"] / timings["copy"]["seconds"]
+        results.append({"rows": rows, **timings})
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS bench_transactions")
+    return results
+
+# Date-bounded queries that must be answered from an index on transactions
+INDEX_CHECKS = {
+    "transactions_by_date": lambda: {"date": (pd.Timestamp.today() - pd.Timedelta(days=40)).date()},
+    "daily_net_summary_last_n_days": dict,
+    "credit_card_summary": dict,
+}
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+def bench_explain(args):
+    # Load synthetic data through database.load() and assert the planner bounds each date-range
+    # query: by an index on transactions, or by scanning only some of its monthly partitions
+    db_engine = get_engine(args.uri or get_connection_uri())
+    connection_uri = db_engine.url.render_as_string(hide_password=False)
+    load(synthetic_transactions(max(args.rows)), "transactions", connection_uri)
+    refresh_rollups(connection_uri)
+
+    catalog = QueryCatalog()
+    suffixes = tuple(f"_{suffix}" for suffix in TABLE_INDEXES["transactions"])
+    results = []
+    with db_engine.connect() as conn:
+        partitions = table_partitions(conn, "transactions")
+        for name, params in INDEX_CHECKS.items():
+            plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + catalog.sql(name)), with_implicit_params(name, params())).scalar()
+            nodes = list(_plan_nodes(plan[0]["Plan"]))
+            indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+            seq_scans = [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"]
+            scanned = {n["Relation Name"] for n in nodes if n.get("Relation Name", "").startswith("transactions")}
+            # Pruned at plan time (fewer partitions in the plan) or at executor startup (Subplans Removed)
+            pruned = bool(partitions) and (len(scanned) < len(partitions) or any(n.get("Subplans Removed") for n in nodes))
+            results.append({
+                "query": name,
+                "indexes": indexes,
+                "seq_scans": seq_scans,
+                "partitions": len(partitions),
+                "pruned": pruned,
+                "uses_index": any(i.startswith("transactions") and i.endswith(suffixes) for i in indexes),
+            })
+            results[-1]["bounded"] = pruned or (results[-1]["uses_index"] and "transactions" not in seq_scans)
+    failed = [r["query"] for r in results if not r["bounded"]]
+    if failed:
+        for r in results:
+            print(json.dumps(r))
+        raise SystemExit(f"Queries scanning all of transactions: {', '.join(failed)}")
+    return results
+
+# Date-bounded queries whose cost should not grow with the length of the history
+PARTITION_QUERIES = ["credit_card_summary", "daily_net_summary_last_n_days", "transactions_by_date"]
+
+def bench_partition(args):
+    # Load time and date-bounded query latency as the history grows, with transactions stored as
+    # one plain table (copy_load) vs. partitioned by month (partition_load); needs PostgreSQL.
+    # Every year of history gets the same number of rows (the smallest --rows), so queries that
+    # prune should stay flat while their cost on the plain table grows with the years.
+    db_engine = get_engine(args.uri or get_connection_uri())
+    per_year = min(args.rows)
+    results = []
+    for years in args.years:
+        df = synthetic_transactions(per_year * years, seed=args.seed, years=years)
+        assign_row_ids(df, 1)
+        result = {"years": years, "rows": len(df)}
+        for layout, loader in (("plain", copy_load), ("partitioned", partition_load)):
+            load_seconds = _wall_time(lambda: loader(df, "transactions", db_engine))
+            result[layout] = {"load_seconds": load_seconds, "queries": time_queries(db_engine, PARTITION_QUERIES, args.repeat)}
+        result["speedup"] = {
+            name: result["plain"]["queries"][name]["seconds"] / result["partitioned"]["queries"][name]["seconds"]
+            for name in PARTITION_QUERIES
+        }
+        results.append(result)
+    return results
+
+def bench_rerun(args):
+    # Per-rerun cost of the app with classic tabs (every tab runs) vs. lazy navigation (only the
+    # selected section runs), measured with Streamlit's AppTest on a synthetic dataset
+    from streamlit.testing.v1 import AppTest
+
+    db_engine = get_engine(args.uri or get_connection_uri())
+    connection_uri = db_engine.url.render_as_string(hide_password=False)
+    transactions = synthetic_transactions(max(args.rows))
+    load(to_bluecoins(transactions), "raw_transactions", connection_uri)
+    load(transactions, "transactions", connection_uri)
+    refresh_rollups(connection_uri)
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    scenarios = [("tabs", None)] + [("lazy", section) for section in ("Home", "Data", "Dashboard", "Documentation")]
+    results = []
+    for mode, section in scenarios:
+        os.environ["SPENDSENSE_LAZY_TABS"] = "1" if mode == "lazy" else "0"
+        at = AppTest.from_file(app_path, default_timeout=600)
+        at.run()
+        if section is not None:
+            at.radio(key="section").set_value(section).run()
+        best = min(_wall_time(at.run) for _ in range(args.repeat))
+        results.append({"rows": max(args.rows), "mode": mode, "section": section, "rerun_seconds": best})
+    return results
+
+def bench_snapshot(args):
+    # Cold fact cube and calendar-day reads from the database vs. the memory-mapped snapshot
+    from read_queries import query
+    db_engine = get_engine(args.uri or get_connection_uri())
+    connection_uri = db_engine.url.render_as_string(hide_password=False)
+    day = (pd.Timestamp.today() - pd.Timedelta(days=40)).date()
+    results = []
+    for rows in args.rows:
+        load(synthetic_transactions(rows), "transactions", connection_uri)
+        refresh_rollups(connection_uri)
+
+        def cold(name, **params):
+            result_cache.clear()
+            return query(name, **params)
+
+        timings = {}
+        for name, database_run, snapshot_run in (
+            ("fact_cube", lambda: cold("fact_cube"), lambda: daily_facts(connection_uri)),
+            ("transactions_by_date", lambda: cold("transactions_by_date", date=day), lambda: transactions_by_date(day, connection_uri)),
+        ):
+            database = min(_wall_time(database_run) for _ in range(args.repeat))
+            snapshot = min(_wall_time(snapshot_run) for _ in range(args.repeat))
+            timings[name] = {"database_seconds": database, "snapshot_seconds": snapshot, "speedup": database / snapshot}
+        results.append({"rows": rows, **timings})
+    return results
+
+# Parameters for the named queries that take any
+QUERY_PARAMS = {
+    "transactions_by_date": lambda: {"date": (pd.Timestamp.today() - pd.Timedelta(days=40)).date()},
+}
+
+def time_queries(db_engine, names, repeat):
+    # Best-of-`repeat` latency of each named query (the engine's dialect variant), straight from
+    # the database with no result cache
+    catalog = QueryCatalog()
+    results = {}
+    for name in names:
+        statement = catalog.statement(name, db_engine.dialect.name)
+        params = with_implicit_params(name, QUERY_PARAMS.get(name, dict)(), db_engine.dialect.name)
+
+        def run():
+            with db_engine.connect() as conn:
+                return pd.read_sql(statement, conn, params=params or None)
+
+        result = run()
+        results[name] = {
+            "seconds": min(_wall_time(run) for _ in range(repeat)),
+            "rows": len(result),
+            "bytes": frame_nbytes(result),
+        }
+    return results
+
+def bench_backends(args):
+    # Latency of every named query on PostgreSQL (when reachable), DuckDB and SQLite, all loaded
+    # with the same synthetic dataset through database.load()
+    workdir = tempfile.mkdtemp(prefix="spendsense-bench-")
+    backends = {"postgresql": args.uri or get_connection_uri()}
+    if embedded_connection_uri().startswith("duckdb"):
+        backends["duckdb"] = embedded_connection_uri(os.path.join(workdir, "bench"))
+    backends["sqlite"] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    catalog = QueryCatalog()
+    results = []
+    try:
+        for rows in args.rows:
+            transactions = synthetic_transactions(rows)
+            for backend, connection_uri in backends.items():
+                db_engine = get_engine(connection_uri)
+                try:
+                    with db_engine.connect():
+                        pass
+                except Exception as e:
+                    print(f"Skipping {backend}: {str(e).splitlines()[0]}")
+                    continue
+                load(to_bluecoins(transactions), "raw_transactions", connection_uri)
+                load(transactions.copy(), "transactions", connection_uri)
+                refresh_rollups(connection_uri)
+                for name, timing in time_queries(db_engine, catalog.names(), args.repeat).items():
+                    results.append({"rows": rows, "backend": backend, "query": name, "result_rows": timing["rows"], "seconds": timing["seconds"]})
+    finally:
+        for backend, connection_uri in backends.items():
+            if backend != "postgresql":
+                get_engine(connection_uri).dispose()
+                drop_snapshot("transactions", connection_uri)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+def bench_etl(args):
+    # End-to-end suite on a generated export: every pipeline stage once, then every named query
+    workdir = tempfile.mkdtemp(prefix="spendsense-bench-")
+    connection_uri = args.uri or embedded_connection_uri(os.path.join(workdir, "bench"))
+    db_engine = get_engine(connection_uri)
+    names = args.queries or QueryCatalog().names()
+    results = []
+    try:
+        for rows in args.rows:
+            path = os.path.join(workdir, f"bluecoins_{rows}.csv")
+            stages = {}
+            _, stages["generate"] = _timed(lambda: write_bluecoins_csv(path, rows, args.seed, args.end_date))
+            raw, stages["extract"] = _timed(lambda: extract(path))
+            cleaned, stages["transform"] = _timed(lambda: transform(raw))
+            _, stages["load_raw_transactions"] = _timed(lambda: load(raw, "raw_transactions", connection_uri))
+            _, stages["load_transactions"] = _timed(lambda: load(cleaned, "transactions", connection_uri))
+            _, stages["refresh_rollups"] = _timed(lambda: refresh_rollups(connection_uri))
+            del raw, cleaned
+            os.remove(path)
+            results.append({
+                "rows": rows,
+                "seed": args.seed,
+                "backend": db_engine.dialect.name,
+                "stages": stages,
+                "queries": time_queries(db_engine, names, args.repeat),
+            })
+    finally:
+        if not args.uri:
+            db_engine.dispose()
+            drop_snapshot("transactions", connection_uri)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def bench_parallel(args):
+    # Multi-file ingest with 1, 2, 4 and 8 (--workers) worker processes: one generated export per
+    # worker of the largest count, each of the smallest --rows, so every run does the same work.
+    # "extract" is the parallel part (parse + transform + merge); "ingest" adds the load. Runs
+    # against a throwaway embedded database unless --uri is given.
+    workdir = tempfile.mkdtemp(prefix="spendsense-bench-")
+    connection_uri = args.uri or embedded_connection_uri(os.path.join(workdir, "bench"))
+    rows = min(args.rows)
+    end = pd.Timestamp(args.end_date or pd.Timestamp.today()).normalize()
+    results = []
+    try:
+        # One file per year, like a user's yearly exports
+        files = [
+            write_bluecoins_csv(os.path.join(workdir, f"bluecoins_{i}.csv"), rows, [args.seed, i], end - pd.DateOffset(years=i))
+            for i in range(max(args.workers))
+        ]
+        for workers in args.workers:
+            extract_seconds = min(_wall_time(lambda: extract_files(files, workers)) for _ in range(args.repeat))
+            ingest_seconds = min(_wall_time(lambda: ingest_files(files, connection_uri, workers=workers)) for _ in range(args.repeat))
+            results.append({
+                "workers": workers,
+                "files": len(files),
+                "rows": rows * len(files),
+                "extract_seconds": extract_seconds,
+                "ingest_seconds": ingest_seconds,
+                "rows_per_sec": rows * len(files) / ingest_seconds,
+            })
+        for result in results:
+            result["extract_speedup"] = results[0]["extract_seconds"] / result["extract_seconds"]
+            result["ingest_speedup"] = results[0]["ingest_seconds"] / result["ingest_seconds"]
+    finally:
+        if not args.uri:
+            get_engine(connection_uri).dispose()
+            drop_snapshot("transactions", connection_uri)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _etl_metrics(path):
+    # {(backend, rows, kind, name): seconds} from an `etl` --output file
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("benchmark") != "etl":
+        raise SystemExit(f"{path} is not an etl benchmark report.")
+    metrics = {}
+    for r in report["results"]:
+        for stage, seconds in r["stages"].items():
+            metrics[(r["backend"], r["rows"], "stage", stage)] = seconds
+        for name, timing in r["queries"].items():
+            metrics[(r["backend"], r["rows"], "query", name)] = timing["seconds"]
+    return metrics
+
+def bench_compare(args):
+    # Candidate / baseline time per metric present in both reports; slower than --threshold fails
+    if not args.files or len(args.files) != 2:
+        raise SystemExit("compare needs --files BASELINE CANDIDATE")
+    baseline, candidate = (_etl_metrics(path) for path in args.files)
+    results = []
+    for key in sorted(set(baseline) & set(candidate), key=str):
+        backend, rows, kind, name = key
+        ratio = candidate[key] / baseline[key] if baseline[key] else None
+        results.append({
+            "backend": backend, "rows": rows, "kind": kind, "name": name,
+            "baseline_seconds": baseline[key], "candidate_seconds": candidate[key], "ratio": ratio,
+            "regression": ratio is not None and ratio > args.threshold,
+        })
+    return results
+
+def environment():
+    # Recorded with every report so results can be matched to a commit and machine
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def _wall_time(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+BENCHMARKS = {
+    "backends": bench_backends,
+    "compare": bench_compare,
+    "etl": bench_etl,
+    "generate": bench_generate,
+    "catalog": bench_catalog,
+    "load": bench_load,
+    "parallel": bench_parallel,
+    "partition": bench_partition,
+    "explain": bench_explain,
+    "memory": bench_memory,
+    "rerun": bench_rerun,
+    "snapshot": bench_snapshot,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="SpendSense micro-benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--number", type=int, default=1000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs (best is reported)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="dataset sizes for database benchmarks")
+    parser.add_argument("--uri", help="database URI (defaults to SPENDSENSE_DATABASE_URI)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--seed", type=int, default=0, help="seed for generated data")
+    parser.add_argument("--end-date", help="last day of generated data (default today)")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 5, 10],
+                        help="history lengths `partition` compares (rows per year: the smallest --rows)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="worker processes `parallel` compares (the first is the baseline)")
+    parser.add_argument("--csv-dir", default=".", help="where `generate` writes its CSV files")
+    parser.add_argument("--queries", nargs="+", help="named queries `etl` times (default all)")
+    parser.add_argument("--files", nargs="+", help="baseline and candidate reports for `compare`")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio `compare` reports as a regression")
+    args = parser.parse_args()
+
+    results = BENCHMARKS[args.benchmark](args)
+    for r in results:
+        print(json.dumps(r))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": args.benchmark, "environment": environment(), "results": results}, f, indent=2)
+    if args.benchmark == "compare" and any(r["regression"] for r in results):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
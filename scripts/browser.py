@@ -0,0 +1,96 @@
+import time
+import pandas as pd
+from sqlalchemy import bindparam, text
+from engine import read_connection
+from scheduler import QUERY_TIMEOUT
+from cache import result_cache
+from metrics import metrics
+
+# Tables the Data tab can page through. Only these identifiers are ever put into SQL text;
+# every user-supplied value is a bound parameter.
+#   sort:    sort option -> column, paged by keyset on (column, id)
+#   filters: column offered as an "is one of" filter
+#   search:  column matched by a case-insensitive substring search
+BROWSABLE_TABLES = {
+    "transactions": {
+        "sort": {"date": "date", "amount": "amount"},
+        "filters": ["type", "account", "category"],
+        "search": "item",
+    },
+    "raw_transactions": {
+        "sort": {"date": '"Date"'},
+        "filters": ['"Type"', '"Account"', '"Category"', '"Status"'],
+        "search": '"Title"',
+    },
+}
+
+def _python_value(value):
+    # NumPy/pandas scalars from a previous page -> plain Python values the driver can bind
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+def _cached(name, key_params, sql, params=None):
+    # Result-cached read, recorded in the metrics like a named query
+    start = time.perf_counter()
+    key = result_cache.key(name, key_params)
+    entry = result_cache.get_entry(key)
+    if entry is not None:
+        df, nbytes = entry
+        cache = "hit"
+    else:
+        with read_connection(QUERY_TIMEOUT) as conn:
+            df = pd.read_sql(sql, conn, params=params)
+        nbytes = result_cache.put(key, df)
+        cache = "miss"
+    metrics.record_query(name, time.perf_counter() - start, len(df), nbytes, cache)
+    return df
+
+def filter_options(table, column):
+    # Distinct values for a filter dropdown (an index scan for the indexed columns)
+    if column not in BROWSABLE_TABLES[table]["filters"]:
+        raise ValueError(f"'{column}' is not a filter column of {table}.")
+    df = _cached(f"browse_options:{table}", {"column": column},
+                 text(f"SELECT DISTINCT {column} AS value FROM {table} WHERE {column} IS NOT NULL ORDER BY 1"))
+    return df['value'].tolist()
+
+def fetch_page(table, sort="date", descending=False, filters=None, search=None, cursor=None, page_size=100):
+    # One page of `table` in (sort column, id) order, starting after `cursor` (the (value, id)
+    # of the previous page's last row). Returns (page, next_cursor); next_cursor is None on the last page.
+    spec = BROWSABLE_TABLES[table]
+    sort_column = spec["sort"][sort]
+    conditions = []
+    params = {"limit": page_size + 1}
+    bindparams = []
+
+    for i, (column, values) in enumerate((filters or {}).items()):
+        if column not in spec["filters"]:
+            raise ValueError(f"'{column}' is not a filter column of {table}.")
+        if values:
+            conditions.append(f"{column} IN :filter_{i}")
+            params[f"filter_{i}"] = list(values)
+            bindparams.append(bindparam(f"filter_{i}", expanding=True))
+    if search:
+        conditions.append(f"LOWER({spec['search']}) LIKE :search")
+        params["search"] = f"%{search.lower()}%"
+    if cursor is not None:
+        conditions.append(f"({sort_column}, id) {'<' if descending else '>'} (:cursor_value, :cursor_id)")
+        params["cursor_value"] = _python_value(cursor[0])
+        params["cursor_id"] = _python_value(cursor[1])
+
+    direction = "DESC" if descending else "ASC"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = text(f"SELECT * FROM {table} {where} ORDER BY {sort_column} {direction}, id {direction} LIMIT :limit")
+    if bindparams:
+        sql = sql.bindparams(*bindparams)
+
+    page = _cached(f"browse:{table}", {"sql": str(sql), **params}, sql, params)
+
+    # The extra row only tells us whether another page exists
+    next_cursor = None
+    if len(page) > page_size:
+        page = page.iloc[:page_size]
+        last = page.iloc[-1]
+        next_cursor = (last[sort_column.strip('"')], last['id'])
+    page.index = range(1, len(page) + 1)
+    return page, next_cursor
@@ -0,0 +1,210 @@
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import text
+from engine import get_connection_uri, get_engine
+
+# Seconds a process keeps using the data generation it last read from the database
+DATA_VERSION_TTL = float(os.environ.get("SPENDSENSE_DATA_VERSION_TTL", 2))
+
+# The data generation is kept in the database (a one-row data_version table) and bumped by every
+# write to it (database.load / database.drop / an ingest transaction), so loads by any process,
+# scripts/etl.py included, reach every app process. Cached results carry the generation they
+# were computed under, so a bump invalidates everything cached before it.
+_generations = {}
+_generation_lock = threading.Lock()
+
+def _ensure_data_version(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS data_version (version BIGINT NOT NULL)"))
+    conn.execute(text("INSERT INTO data_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM data_version)"))
+
+def bump_data_version(conn):
+    # Inside the writing transaction, so the new generation commits with the data
+    _ensure_data_version(conn)
+    conn.execute(text("UPDATE data_version SET version = version + 1"))
+
+def data_generation(connection_uri=None):
+    # Read from the database at most every DATA_VERSION_TTL seconds per process
+    connection_uri = connection_uri or get_connection_uri()
+    now = time.monotonic()
+    with _generation_lock:
+        generation, read_at = _generations.get(connection_uri, (0, None))
+        if read_at is not None and now - read_at < DATA_VERSION_TTL:
+            return generation
+    try:
+        with get_engine(connection_uri).connect() as conn:
+            generation = conn.execute(text("SELECT MAX(version) FROM data_version")).scalar() or 0
+    except Exception:
+        # No data loaded yet (no table), or the database is unavailable: keep the last one read
+        pass
+    with _generation_lock:
+        _generations[connection_uri] = (generation, now)
+    return generation
+
+def bump_data_generation(connection_uri=None):
+    # After a write committed on its own. This process reads the new generation on its next
+    # data_generation() call, other processes within DATA_VERSION_TTL seconds.
+    connection_uri = connection_uri or get_connection_uri()
+    with get_engine(connection_uri).begin() as conn:
+        bump_data_version(conn)
+    with _generation_lock:
+        _generations.pop(connection_uri, None)
+
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def _freeze(value):
+    # Make bound parameters usable inside a dict key
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class ResultCache:
+    # Process-wide LRU cache of query results bounded by total DataFrame memory (in bytes)
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Generation of the cached entries, set by the first put()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, query_name, params):
+        # Queries using CURRENT_DATE change at midnight even without new data, so the day is part of the key
+        return (data_generation(), datetime.date.today(), query_name, _freeze(params))
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        # (result, its size in bytes) or None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers are free to modify what they get back
+        return entry[0].copy(), entry[1]
+
+    def put(self, key, df):
+        # Returns the result's size, which callers can report without measuring it again
+        nbytes = frame_nbytes(df)
+        generation = data_generation()
+        # A query that started before the latest write computed its result from older data; its
+        # key can never be hit again, so it is not cached
+        if nbytes > self.max_bytes or key[0] != generation:
+            return nbytes
+        with self._lock:
+            if self._generation != generation:
+                # Entries from an older generation can never be hit again, wherever they sit in the LRU order
+                for stale_key in [k for k in self._entries if k[0] != generation]:
+                    self._bytes -= self._entries.pop(stale_key)[1]
+                    self.evictions += 1
+                self._generation = generation
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df.copy(), nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, oldest_bytes) = self._entries.popitem(last=False)
+                self._bytes -= oldest_bytes
+                self.evictions += 1
+        return nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "generation": data_generation(),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def frame_fingerprint(df):
+    # Content hash of a DataFrame (values, index, column names and dtypes)
+    values = int(pd.util.hash_pandas_object(df, index=True).sum()) if len(df) else 0
+    return (values, len(df), tuple(map(str, df.columns)), tuple(map(str, df.dtypes)))
+
+class FigureCache:
+    # Process-wide LRU cache of built Plotly figures, bounded by their total serialized size.
+    # Entries are keyed on the content of the plotted frame, so they need no invalidation; a
+    # changed frame simply misses and its old figure ages out. Cached figures are shared: callers
+    # must not modify what they get back.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, chart, df, args, kwargs):
+        return (chart, frame_fingerprint(df), _freeze(args), _freeze(kwargs))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, fig):
+        nbytes = len(fig.to_json())
+        if nbytes > self.max_bytes:
+            return nbytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (fig, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, oldest_bytes) = self._entries.popitem(last=False)
+                self._bytes -= oldest_bytes
+                self.evictions += 1
+        return nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+result_cache = ResultCache(int(os.environ.get("SPENDSENSE_CACHE_MAX_BYTES", 256 * 1024 * 1024)))
+figure_cache = FigureCache(int(os.environ.get("SPENDSENSE_FIGURE_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
@@ -1,46 +1,808 @@
+import io
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from engine import get_engine
+from cache import bump_data_generation, bump_data_version, frame_nbytes
+from snapshot import (SNAPSHOT_TABLES, drop_snapshot, publish_snapshot, snapshot_enabled, stage_snapshot,
+                      update_snapshot, write_snapshot)
+
+# Rows per chunk for streaming ingest of large exports
+DEFAULT_CHUNKSIZE = 50_000
+# Rows rendered to CSV at a time while streaming a DataFrame through COPY
+COPY_ROWS_PER_SLICE = 50_000
+# Print the in-memory size of each pipeline stage's output (SPENDSENSE_REPORT_MEMORY=1)
+REPORT_MEMORY = os.environ.get("SPENDSENSE_REPORT_MEMORY", "0").lower() in ("1", "true", "yes")
+# Worker processes parsing and transforming the files of a multi-file ingest (0: one per CPU)
+INGEST_PROCESSES = int(os.environ.get("SPENDSENSE_INGEST_PROCESSES", 0))
+
+# Columns of a Bluecoins export the pipeline uses; anything else (Notes, Labels, ...) is
+# dropped while parsing instead of being materialized and thrown away later
+RAW_COLUMNS = ['Type', 'Date', 'Title', 'Amount', 'Currency', 'Category', 'Account', 'Status']
+# Low-cardinality columns are parsed straight into categoricals. Amount keeps the inferred
+# float64: float32 cannot hold larger amounts to the cent.
+RAW_DTYPES = {column: 'category' for column in ('Type', 'Currency', 'Category', 'Account', 'Status')}
+# Cleaned columns stored as categoricals after transform()
+CATEGORICAL_COLUMNS = ['type', 'currency', 'category', 'account', 'status']
+
+def report_memory(stage, df):
+    if REPORT_MEMORY:
+        print(f"[memory] {stage}: {frame_nbytes(df) / 2**20:.1f} MiB ({len(df):,} rows x {len(df.columns)} columns)")
+    return df
 
 def extract(file):
-    raw_transactions = pd.read_csv(file)
-    return raw_transactions
+    raw_transactions = pd.read_csv(file, usecols=RAW_COLUMNS, dtype=RAW_DTYPES)
+    return report_memory("extract", raw_transactions)
+
+def extract_chunks(file, chunksize=DEFAULT_CHUNKSIZE):
+    # Read the upload lazily in fixed-size chunks. Every column is read as text so each chunk
+    # has the same schema no matter which values it happens to contain.
+    return pd.read_csv(file, chunksize=chunksize, usecols=RAW_COLUMNS, dtype=str)
 
 def transform(df):
-    col_names = ['Type', 'Date', 'Title', 'Amount', 'Currency', 'Category', 'Account', 'Status']
-    cleaned_df = df.loc[df['Status'] == 'Reconciled', col_names]
+    report_memory("transform input", df)
+    col_names = list(RAW_COLUMNS)
     new_col_names = ['type', 'date', 'item', 'amount', 'currency', 'category', 'account', 'status']
+    # Keep the row fingerprint written by incremental ingest
+    if 'row_hash' in df.columns:
+        col_names.append('row_hash')
+        new_col_names.append('row_hash')
+    cleaned_df = df.loc[df['Status'] == 'Reconciled', col_names]
     cleaned_df.columns = new_col_names
     cleaned_df['date'] = pd.to_datetime(cleaned_df['date'])
     # Normalize type values for easier querying
     cleaned_df['type'] = cleaned_df['type'].str.lower().str.strip()
     # Ensure amount is numeric
     cleaned_df['amount'] = pd.to_numeric(cleaned_df['amount'], errors='coerce').fillna(0)
-    return cleaned_df
-
-def load(df, db_table, connection_uri):
-    db_engine = create_engine(connection_uri)
-    df.to_sql(
-        name=db_table,
-        con=db_engine,
-        if_exists="replace",
-        index=False)
-
-def drop(table, connection_uri):
-    db_engine = create_engine(connection_uri)
+    # Drop categories that only occurred in filtered-out rows
+    for column in CATEGORICAL_COLUMNS:
+        cleaned_df[column] = cleaned_df[column].astype('category').cat.remove_unused_categories()
+    cleaned_df['is_card'] = card_account_flags(cleaned_df['account'])
+    return report_memory("transform", cleaned_df)
+
+# Account name fragments (lower case) that mark a credit card account
+CARD_ACCOUNT_PATTERNS = ('credit', 'visa', 'mastercard', 'amex', 'american express', 'discover')
+
+def card_account_flags(accounts):
+    # Stored with every transaction so the credit card summary filters on a flag instead of
+    # matching account names. Matched once per distinct account, then mapped onto the rows.
+    accounts = accounts.astype('category')
+    names = accounts.cat.categories.astype(str).str.lower()
+    is_card = np.zeros(len(names), dtype=bool)
+    for pattern in CARD_ACCOUNT_PATTERNS:
+        is_card |= np.asarray(names.str.contains(pattern, regex=False), dtype=bool)
+    codes = accounts.cat.codes.to_numpy()
+    # Rows without an account (code -1) are not card rows
+    return np.where(codes >= 0, is_card[codes] if len(is_card) else False, False)
+
+def column_type(dtype):
+    # Explicit PostgreSQL column type for a pandas dtype (same types to_sql would have picked)
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMP WITH TIME ZONE"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP WITHOUT TIME ZONE"
+    return "TEXT"
+
+# Indexes maintained on loaded tables: index name suffix -> indexed columns (optionally with a WHERE clause)
+TABLE_INDEXES = {
+    "raw_transactions": {
+        "id_idx": "(id)",
+        "date_id_idx": '("Date", id)',
+    },
+    "transactions": {
+        "id_idx": "(id)",
+        # (date, id) also serves plain date-range filters
+        "date_id_idx": "(date, id)",
+        "type_date_idx": "(type, date)",
+        "account_idx": "(account)",
+        "category_idx": "(category)",
+        # Only card rows, the credit card summary's current-month range scan
+        "credit_card_date_idx": "(date) WHERE is_card",
+    },
+}
+
+# Tables given a sequential id column, the tie-breaker for keyset pagination on (date, id)
+KEYED_TABLES = {"raw_transactions", "transactions"}
+
+@contextmanager
+def _transaction(bind):
+    # A Connection (an ingest transaction's) is used as it is; an Engine gets a transaction of its own
+    if isinstance(bind, Connection):
+        yield bind
+    else:
+        with bind.begin() as conn:
+            yield conn
+
+def next_row_id(db_engine, db_table, if_exists):
+    if if_exists == "replace":
+        return 1
+    # Read through the same transaction as the load, which may have created or filled the table
+    with _transaction(db_engine) as conn:
+        if not inspect(conn).has_table(db_table):
+            return 1
+        return conn.execute(text(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {db_table}")).scalar()
+
+def assign_row_ids(df, start):
+    # Number the rows from `start`, in place (a copy would double memory for large loads)
+    ids = np.arange(start, start + len(df), dtype=np.int64)
+    if 'id' in df.columns:
+        df['id'] = ids
+    else:
+        df.insert(0, 'id', ids)
+
+def create_indexes(conn, db_table, target=None):
+    # Build db_table's indexes on `target`: the table itself, or its staging copy before the swap.
+    # DuckDB scans with per-block min/max zone maps instead (and has no partial indexes).
+    if conn.dialect.name == "duckdb":
+        return
+    target = target or db_table
+    for suffix, definition in TABLE_INDEXES.get(db_table, {}).items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {target}_{suffix} ON {target} {definition}"))
+
+def rename_indexes(conn, staging, target):
+    # PostgreSQL: give the indexes of `staging` (a staging table or partition) the names they have
+    # on `target`. Partitions created by an append carry PostgreSQL's generated names, so the
+    # names are looked up rather than derived from TABLE_INDEXES.
+    names = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :name"
+    ), {"name": staging}).scalars().all()
+    for name in names:
+        if name.startswith(f"{staging}_"):
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {target}{name[len(staging):]}"))
+
+def swap_in(conn, db_table):
+    # Replace db_table with the staging copy a load built ({db_table}__loading, with its indexes
+    # and, when partitioned, its partitions). This is the only step of a replace that locks the
+    # live table, so an ingest transaction runs it for every table just before committing.
+    quote = conn.dialect.identifier_preparer.quote
+    staging_table = f"{db_table}__loading"
+    dialect = conn.dialect.name
+    partitions = sorted(table_partitions(conn, staging_table)) if dialect == "postgresql" else []
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {quote(db_table)}")
+    if dialect == "postgresql":
+        # Indexes first: they are looked up by the name of the table they are on
+        rename_indexes(conn, staging_table, db_table)
+        for staging_partition in partitions:
+            partition = staging_partition[:-len("__loading")]
+            rename_indexes(conn, staging_partition, partition)
+            conn.exec_driver_sql(f"ALTER TABLE {quote(staging_partition)} RENAME TO {quote(partition)}")
+    conn.exec_driver_sql(f"ALTER TABLE {quote(staging_table)} RENAME TO {quote(db_table)}")
+    if dialect != "postgresql":
+        # SQLite cannot rename indexes: the staging copy is loaded without them and indexed here
+        create_indexes(conn, db_table)
+
+class CsvStream:
+    # Read-only file object that renders a DataFrame to CSV one slice of rows at a time,
+    # so COPY can consume it without the whole file ever being held in memory
+    def __init__(self, df, rows_per_slice=COPY_ROWS_PER_SLICE):
+        self._df = df
+        self._rows_per_slice = rows_per_slice
+        self._start = 0
+        self._current = io.StringIO()
+
+    def _next_slice(self):
+        end = self._start + self._rows_per_slice
+        data = self._df.iloc[self._start:end].to_csv(header=False, index=False)
+        self._start = end
+        return data
+
+    def read(self, size=-1):
+        data = self._current.read(size)
+        while (size is None or size < 0 or len(data) < size) and self._start < len(self._df):
+            self._current = io.StringIO(self._next_slice())
+            data += self._current.read(-1 if size is None or size < 0 else size - len(data))
+        return data
+
+def _copy_from(cursor, copy_sql, stream):
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2
+        cursor.copy_expert(copy_sql, stream, size=1024 * 1024)
+    else:
+        # psycopg 3
+        with cursor.copy(copy_sql) as copy:
+            while True:
+                data = stream.read(1024 * 1024)
+                if not data:
+                    break
+                copy.write(data)
+
+def _column_definitions(df, quote):
+    return ", ".join(f"{quote(str(name))} {column_type(dtype)}" for name, dtype in df.dtypes.items())
+
+def _copy_rows(conn, df, copy_target, quote):
+    column_list = ", ".join(quote(str(name)) for name in df.columns)
+    cursor = conn.connection.cursor()
+    try:
+        _copy_from(cursor, f"COPY {copy_target} ({column_list}) FROM STDIN WITH (FORMAT csv)", CsvStream(df))
+    finally:
+        cursor.close()
+
+def copy_load(df, db_table, db_engine, if_exists="replace", staged=False):
+    # Bulk load through COPY FROM STDIN. With if_exists="replace" the rows go into a staging table
+    # that is swapped in by rename inside the same transaction, so readers only ever see the old
+    # table or the complete new one. With staged=True (inside an ingest transaction) the staging
+    # table is left for the transaction to swap in, and appends go into it.
+    quote = db_engine.dialect.identifier_preparer.quote
+    columns = _column_definitions(df, quote)
+    target = quote(db_table)
+    staging_table = f"{db_table}__loading"
+    staging = quote(staging_table)
+
+    with _transaction(db_engine) as conn:
+        if if_exists == "replace":
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {staging}")
+            conn.exec_driver_sql(f"CREATE TABLE {staging} ({columns})")
+        elif not staged:
+            conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {target} ({columns})")
+        copy_table = staging_table if if_exists == "replace" or staged else db_table
+
+        _copy_rows(conn, df, quote(copy_table), quote)
+
+        # Indexes are built once after the bulk load rather than maintained row by row
+        create_indexes(conn, db_table, copy_table)
+        # Statistics stay with the table through the rename
+        conn.exec_driver_sql(f"ANALYZE {quote(copy_table)}")
+
+        if if_exists == "replace" and not staged:
+            swap_in(conn, db_table)
+
+# PostgreSQL tables stored as one partition per month of this column, so date-bounded queries
+# only scan the months they ask for; set SPENDSENSE_PARTITION=0 to load plain tables
+PARTITIONED_TABLES = {"transactions": "date"}
+PARTITION_TABLES = os.environ.get("SPENDSENSE_PARTITION", "1").lower() in ("1", "true", "yes", "on")
+
+def month_partitions(db_table, dates):
+    # {partition name: (row positions, lower bound, upper bound)}; rows without a date go to the
+    # DEFAULT partition, which has no bounds
+    keys = (dates.dt.year * 100 + dates.dt.month).fillna(0).astype('int64').to_numpy()
+    partitions = {}
+    for key, positions in pd.Series(keys).groupby(keys).indices.items():
+        if key:
+            start = pd.Timestamp(year=key // 100, month=key % 100, day=1)
+            partitions[f"{db_table}_p{key}"] = (positions, start, start + pd.DateOffset(months=1))
+        else:
+            partitions[f"{db_table}_default"] = (positions, None, None)
+    return partitions
+
+def _partition_bound(start, end):
+    if start is None:
+        return "DEFAULT"
+    return f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+
+def _relation_kind(conn, db_table):
+    # 'p' for a partitioned table, 'r' for a plain one, None when it does not exist
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": db_table}).scalar()
+
+def table_partitions(conn, db_table):
+    return set(conn.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:name)"
+    ), {"name": db_table}).scalars())
+
+def partition_load(df, db_table, db_engine, if_exists="replace", staged=False):
+    # COPY into a table range-partitioned by month (PostgreSQL), in one transaction.
+    # An append only touches the months present in `df`: missing partitions are created and the
+    # rows are routed into theirs. A replace builds every month as a standalone table, with its
+    # indexes and a CHECK constraint matching the partition bound (so ATTACH skips its validation
+    # scan), attaches them to a new partitioned staging table and swaps that in (left to the
+    # ingest transaction with staged=True, like copy_load()).
+    quote = db_engine.dialect.identifier_preparer.quote
+    column = PARTITIONED_TABLES[db_table]
+    columns = _column_definitions(df, quote)
+    partitions = month_partitions(db_table, df[column])
+    # Partitions of the staging table carry the same suffix until the swap renames them
+    suffix = "__loading" if if_exists == "replace" or staged else ""
+    parent = quote(db_table + suffix)
+
+    with _transaction(db_engine) as conn:
+        kind = _relation_kind(conn, db_table + suffix)
+        if if_exists == "append" and kind == "r":
+            # A plain table from before partitioning: keep appending to it until the next full load
+            _copy_rows(conn, df, parent, quote)
+            conn.exec_driver_sql(f"ANALYZE {parent}")
+            return
+
+        if if_exists == "replace":
+            # Dropping a partitioned table drops its partitions
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {parent}")
+            for name, (positions, start, end) in partitions.items():
+                staging = quote(name + suffix)
+                check = (f"{quote(column)} IS NULL" if start is None else
+                         f"{quote(column)} >= '{start:%Y-%m-%d}' AND {quote(column)} < '{end:%Y-%m-%d}'")
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {staging}")
+                conn.exec_driver_sql(f"CREATE TABLE {staging} ({columns}, CHECK ({check}))")
+                _copy_rows(conn, df.iloc[positions], staging, quote)
+                create_indexes(conn, db_table, name + suffix)
+            kind = None
+
+        if kind is None:
+            conn.exec_driver_sql(f"CREATE TABLE {parent} ({columns}) PARTITION BY RANGE ({quote(column)})")
+            # Partitioned indexes: an attached partition's matching indexes become their children
+            create_indexes(conn, db_table, db_table + suffix)
+
+        if if_exists == "replace":
+            for name, (positions, start, end) in partitions.items():
+                conn.exec_driver_sql(f"ALTER TABLE {parent} ATTACH PARTITION {quote(name + suffix)} {_partition_bound(start, end)}")
+            # Autovacuum never analyzes a partitioned parent; ANALYZE on it also covers every partition
+            conn.exec_driver_sql(f"ANALYZE {parent}")
+            if not staged:
+                swap_in(conn, db_table)
+        else:
+            existing = table_partitions(conn, db_table + suffix)
+            for name, (positions, start, end) in partitions.items():
+                if name + suffix not in existing:
+                    conn.exec_driver_sql(f"CREATE TABLE {quote(name + suffix)} PARTITION OF {parent} {_partition_bound(start, end)}")
+            _copy_rows(conn, df, parent, quote)
+            # Only the months that received rows (the parent's statistics wait for the next full load)
+            for name in partitions:
+                conn.exec_driver_sql(f"ANALYZE {quote(name + suffix)}")
+
+def duckdb_load(df, db_table, db_engine, if_exists="replace", staged=False):
+    # DuckDB reads the DataFrame in place (no per-row INSERTs), staging and swapping tables like copy_load()
+    frame = df.copy(deep=False)
+    for column in frame.columns:
+        # Plain text columns rather than DuckDB ENUMs, so later appends may bring new values
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype(frame[column].cat.categories.dtype)
+    quote = db_engine.dialect.identifier_preparer.quote
+    target = quote(db_table)
+    staging = quote(f"{db_table}__loading")
+
+    with _transaction(db_engine) as conn:
+        duckdb_conn = conn.connection.driver_connection
+        duckdb_conn.register("load_frame", frame)
+        try:
+            if if_exists == "replace":
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {staging}")
+                conn.exec_driver_sql(f"CREATE TABLE {staging} AS SELECT * FROM load_frame")
+                if not staged:
+                    swap_in(conn, db_table)
+            elif staged:
+                conn.exec_driver_sql(f"INSERT INTO {staging} BY NAME SELECT * FROM load_frame")
+            else:
+                conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {target} AS SELECT * FROM load_frame LIMIT 0")
+                conn.exec_driver_sql(f"INSERT INTO {target} BY NAME SELECT * FROM load_frame")
+        finally:
+            duckdb_conn.unregister("load_frame")
+
+def load(df, db_table, connection_uri=None, if_exists="replace", transaction=None):
+    # With an IngestTransaction (see ingest_transaction()) the write joins its transaction, and the
+    # snapshot update and cache invalidation wait until it commits
+    db_engine = transaction.conn if transaction is not None else get_engine(connection_uri)
+    # Replaced tables are written to staging copies that the transaction swaps in before it commits
+    staged = transaction is not None and transaction.stage(db_table, if_exists)
+    if db_table in KEYED_TABLES:
+        assign_row_ids(df, next_row_id(db_engine, f"{db_table}__loading" if staged else db_table, if_exists))
+    if db_engine.dialect.name == "postgresql" and PARTITION_TABLES and db_table in PARTITIONED_TABLES:
+        partition_load(df, db_table, db_engine, if_exists, staged)
+    elif db_engine.dialect.name == "postgresql":
+        copy_load(df, db_table, db_engine, if_exists, staged)
+    elif db_engine.dialect.name == "duckdb":
+        duckdb_load(df, db_table, db_engine, if_exists, staged)
+    else:
+        with _transaction(db_engine) as conn:
+            df.to_sql(
+                name=f"{db_table}__loading" if staged else db_table,
+                con=conn,
+                if_exists=if_exists,
+                index=False)
+            if not staged:
+                create_indexes(conn, db_table)
+    if transaction is not None:
+        transaction.snapshot(df, db_table, if_exists)
+        return
+    update_snapshot(df, db_table, connection_uri, if_exists)
+    bump_data_generation(connection_uri)
+
+class IngestTransaction:
+    # State of one ingest_transaction(): the connection every write goes through, the tables it
+    # replaces (loaded into staging copies, swapped in just before the commit) and the snapshot
+    # changes that are published once the database transaction has committed. Replaced tables get
+    # a new snapshot built in a staging directory; appends to the published snapshot are kept and
+    # applied after the commit.
+
+    def __init__(self, conn, connection_uri):
+        self.conn = conn
+        self.connection_uri = connection_uri
+        self._swaps = []
+        self._staging = {}
+        self._appends = []
+        self._failed = set()
+
+    def stage(self, table, if_exists):
+        # Whether a load of `table` goes to its staging copy: from its first replace on, every
+        # later write of the ingest (e.g. the next streamed chunk) does
+        if if_exists == "replace" and table not in self._swaps:
+            self._swaps.append(table)
+        return table in self._swaps
+
+    def table(self, name):
+        # The table holding `name`'s rows as this transaction sees them
+        return f"{name}__loading" if name in self._swaps else name
+
+    def swap(self):
+        for table in self._swaps:
+            swap_in(self.conn, table)
+        self._swaps = []
+
+    def snapshot(self, df, table, if_exists):
+        if not snapshot_enabled() or table not in SNAPSHOT_TABLES or table in self._failed:
+            return
+        try:
+            if if_exists == "replace":
+                self.discard(table)
+                self._staging[table] = stage_snapshot(table, self.connection_uri)
+            if table in self._staging:
+                write_snapshot(df, table, self.connection_uri, "append", path=self._staging[table])
+            else:
+                self._appends.append((df, table))
+        except Exception as e:
+            # Published as a missing snapshot, so reads go to the database rather than stale files
+            print(f"Error staging {table} snapshot: {str(e)}")
+            self.discard(table)
+            self._failed.add(table)
+
+    def publish(self):
+        for table in self._failed:
+            drop_snapshot(table, self.connection_uri)
+        for table, staging in list(self._staging.items()):
+            publish_snapshot(staging, table, self.connection_uri)
+            del self._staging[table]
+        for df, table in self._appends:
+            update_snapshot(df, table, self.connection_uri, "append")
+        self._appends = []
+
+    def discard(self, table=None):
+        for name in [table] if table is not None else list(self._staging):
+            staging = self._staging.pop(name, None)
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+@contextmanager
+def ingest_transaction(connection_uri=None):
+    # Everything loaded with the yielded IngestTransaction becomes visible at once when the block
+    # exits: the database writes share one transaction and the snapshot is swapped in after the
+    # commit. An exception (a failed stage, a cancelled job) rolls all of it back.
+    db_engine = get_engine(connection_uri)
+    with db_engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # pysqlite leaves DDL outside any transaction until the first INSERT; open one explicitly
+            conn.exec_driver_sql("BEGIN")
+        transaction = IngestTransaction(conn, connection_uri)
+        try:
+            yield transaction
+            # Locks on the live tables are only taken here, so readers wait for the swaps and the
+            # commit rather than for the whole load
+            transaction.swap()
+            bump_data_version(conn)
+        except BaseException:
+            transaction.discard()
+            raise
+    transaction.publish()
+    # Once more now that the snapshot is published: a process that read the committed generation
+    # before that may have cached results computed from the old snapshot
+    bump_data_generation(connection_uri)
+
+def _no_progress(stage, **counts):
+    pass
+
+# Ingest functions report progress(stage, **running totals) as they go: stages are "parse",
+# "transform", "merge" (multi-file only), "load", "rollups" and "publish", and the totals
+# parsed_rows, transformed_rows and loaded_rows (rows written to transactions). A callback that
+# raises stops the ingest, and its transaction rolls back; that is how jobs.py cancels one.
+
+def ingest_replace(file, connection_uri=None, progress=None):
+    # extract -> load(raw) -> transform -> load(cleaned) -> rollups, published together
+    progress = progress or _no_progress
+    progress("parse")
+    raw_transactions = extract(file)
+    progress("parse", parsed_rows=len(raw_transactions))
+    with ingest_transaction(connection_uri) as transaction:
+        progress("load")
+        load(raw_transactions, "raw_transactions", connection_uri, transaction=transaction)
+        progress("transform")
+        cleaned_transactions = transform(raw_transactions)
+        progress("transform", transformed_rows=len(cleaned_transactions))
+        progress("load")
+        load(cleaned_transactions, "transactions", connection_uri, transaction=transaction)
+        progress("load", loaded_rows=len(cleaned_transactions))
+        progress("rollups")
+        refresh_rollups(connection_uri, transaction=transaction)
+        progress("publish")
+    return len(raw_transactions), len(cleaned_transactions)
+
+def ingest_stream(file, connection_uri=None, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    # Streaming version of ingest_replace(): each chunk is transformed and written before the next
+    # one is read, so memory is bounded by the chunk size. The chunks still publish together.
+    progress = progress or _no_progress
+    raw_rows = 0
+    cleaned_rows = 0
+    if_exists = "replace"
+    with ingest_transaction(connection_uri) as transaction:
+        chunks = extract_chunks(file, chunksize)
+        while True:
+            progress("parse")
+            raw_chunk = next(chunks, None)
+            if raw_chunk is None:
+                break
+            raw_rows += len(raw_chunk)
+            progress("parse", parsed_rows=raw_rows)
+            progress("load")
+            load(raw_chunk, "raw_transactions", connection_uri, if_exists=if_exists, transaction=transaction)
+            progress("transform")
+            cleaned_chunk = transform(raw_chunk)
+            progress("transform", transformed_rows=cleaned_rows + len(cleaned_chunk))
+            progress("load")
+            load(cleaned_chunk, "transactions", connection_uri, if_exists=if_exists, transaction=transaction)
+            if_exists = "append"
+            cleaned_rows += len(cleaned_chunk)
+            progress("load", loaded_rows=cleaned_rows)
+        progress("rollups")
+        refresh_rollups(connection_uri, transaction=transaction)
+        progress("publish")
+    return raw_rows, cleaned_rows
+
+# Pre-aggregated copies of transactions (period x account x category x type) that the dashboard
+# queries read instead of re-scanning the full table; rebuilt after every load
+ROLLUP_PERIODS = {
+    "rollup_daily": "DATE(date)",
+    "rollup_weekly": "DATE_TRUNC('week', date)",
+    "rollup_monthly": "DATE_TRUNC('month', date)",
+}
+# Period expressions for dialects without DATE_TRUNC (weeks start on Monday, as in PostgreSQL)
+ROLLUP_PERIOD_VARIANTS = {
+    "sqlite": {
+        "rollup_daily": "DATE(date)",
+        "rollup_weekly": "DATE(date, 'weekday 0', '-6 days')",
+        "rollup_monthly": "DATE(date, 'start of month')",
+    },
+}
+
+def refresh_rollups(connection_uri=None, transaction=None):
+    # Each rollup is built in a staging table and swapped in, all in one transaction (an ingest
+    # transaction's reads the transactions it staged and swaps the rollups in with them)
+    db_engine = transaction.conn if transaction is not None else get_engine(connection_uri)
+    source = transaction.table("transactions") if transaction is not None else "transactions"
+    with _transaction(db_engine) as conn:
+        for table, period in ROLLUP_PERIOD_VARIANTS.get(conn.dialect.name, ROLLUP_PERIODS).items():
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}__loading")
+            conn.exec_driver_sql(f"""
+                CREATE TABLE {table}__loading AS
+                SELECT
+                    {period} AS period,
+                    account,
+                    category,
+                    type,
+                    SUM(amount) AS amount,
+                    SUM(ROUND(amount)) AS rounded_amount,
+                    COUNT(*) AS transactions
+                FROM {source}
+                GROUP BY 1, 2, 3, 4
+            """)
+            if transaction is not None:
+                transaction.stage(table, "replace")
+            else:
+                swap_in(conn, table)
+    if transaction is None:
+        bump_data_generation(connection_uri)
+
+def fingerprint(df):
+    # 64-bit content hash of each raw row over (type, date, title, amount, account, category).
+    # Values are normalized first so the same row hashes the same whether it was parsed with
+    # inferred dtypes or as text (streaming mode).
+    key = pd.DataFrame({
+        'type': df['Type'].astype(str).str.strip().str.lower(),
+        'date': pd.to_datetime(df['Date']),
+        'title': df['Title'].astype(object).fillna('').astype(str),
+        'amount': pd.to_numeric(df['Amount'], errors='coerce').round(2),
+        'account': df['Account'].astype(object).fillna('').astype(str),
+        'category': df['Category'].astype(object).fillna('').astype(str),
+    })
+    # Identical rows inside one export (e.g. two equal purchases) stay distinct through their occurrence number
+    key['occurrence'] = key.groupby(list(key.columns), dropna=False).cumcount()
+    hashes = pd.util.hash_pandas_object(key, index=False).to_numpy().view(np.int64)
+    return pd.Series(hashes, index=df.index, name='row_hash')
+
+def stored_fingerprints(connection_uri=None, transaction=None):
+    # Fingerprints of every row already in raw_transactions (an index-friendly single-column read)
+    db_engine = transaction.conn if transaction is not None else get_engine(connection_uri)
+    with _transaction(db_engine) as conn:
+        if not inspect(conn).has_table("raw_transactions"):
+            return np.array([], dtype=np.int64)
+        # Column names from an empty result rather than reflection, which not every dialect supports
+        columns = conn.execute(text("SELECT * FROM raw_transactions LIMIT 0")).keys()
+        if "row_hash" in columns:
+            result = conn.execute(text("SELECT row_hash FROM raw_transactions"))
+            return np.fromiter((row[0] for row in result), dtype=np.int64)
+        raw_transactions = pd.read_sql(text("SELECT * FROM raw_transactions"), conn)
+    # Tables written by a full ingest carry no fingerprints yet: add them once
+    raw_transactions['row_hash'] = fingerprint(raw_transactions)
+    load(raw_transactions, "raw_transactions", connection_uri, transaction=transaction)
+    load(transform(raw_transactions), "transactions", connection_uri, transaction=transaction)
+    refresh_rollups(connection_uri, transaction=transaction)
+    return raw_transactions['row_hash'].to_numpy()
+
+def ingest_incremental(file, connection_uri=None, progress=None):
+    # Append only the rows that are not stored yet, so overlapping or cumulative exports
+    # can be uploaded repeatedly and the work done scales with the new rows
+    progress = progress or _no_progress
+    progress("parse")
+    # Raw columns are read as text so appended rows always fit the stored schema
+    raw_transactions = pd.read_csv(file, usecols=RAW_COLUMNS, dtype=str)
+    raw_transactions['row_hash'] = fingerprint(raw_transactions)
+    progress("parse", parsed_rows=len(raw_transactions))
+    with ingest_transaction(connection_uri) as transaction:
+        new_rows = raw_transactions[~raw_transactions['row_hash'].isin(stored_fingerprints(connection_uri, transaction))]
+        if not new_rows.empty:
+            progress("load")
+            load(new_rows, "raw_transactions", connection_uri, if_exists="append", transaction=transaction)
+            progress("transform")
+            cleaned_rows = transform(new_rows)
+            progress("transform", transformed_rows=len(cleaned_rows))
+            progress("load")
+            load(cleaned_rows, "transactions", connection_uri, if_exists="append", transaction=transaction)
+            progress("load", loaded_rows=len(cleaned_rows))
+            progress("rollups")
+            refresh_rollups(connection_uri, transaction=transaction)
+        progress("publish")
+    return len(raw_transactions), len(new_rows)
+
+def extract_transform(file):
+    # One file's share of a multi-file ingest, run in a worker process: parse, fingerprint, clean
+    raw_transactions = extract(file)
+    raw_transactions['row_hash'] = fingerprint(raw_transactions)
+    return raw_transactions, transform(raw_transactions)
+
+def _process_pool(workers):
+    # Workers come from a fork server that has imported this module once: forking the app process
+    # itself is unsafe (its other threads may hold locks) and spawning re-imports pandas per worker
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if "forkserver" in methods:
+        context.set_forkserver_preload(["database"])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def extract_files(files, workers=None, progress=None):
+    # (raw, cleaned, rows read) of several exports (paths), parsed and transformed in parallel and
+    # merged in file order. Rows found in more than one file, as overlapping exports have, are kept once.
+    progress = progress or _no_progress
+    workers = max(1, min(len(files), workers or INGEST_PROCESSES or os.cpu_count() or 1))
+    parts = [None] * len(files)
+    parsed_rows = transformed_rows = 0
+    pool = None
+    progress("parse")
+    try:
+        if workers == 1:
+            results = ((i, extract_transform(file)) for i, file in enumerate(files))
+        else:
+            pool = _process_pool(workers)
+            futures = {pool.submit(extract_transform, file): i for i, file in enumerate(files)}
+            results = ((futures[future], future.result()) for future in as_completed(futures))
+        for i, (raw_part, cleaned_part) in results:
+            parts[i] = (raw_part, cleaned_part)
+            parsed_rows += len(raw_part)
+            transformed_rows += len(cleaned_part)
+            progress("parse", parsed_rows=parsed_rows, transformed_rows=transformed_rows)
+    finally:
+        # Files not started yet are dropped when the ingest stops early
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    progress("merge")
+    raw_transactions = pd.concat([raw_part for raw_part, _ in parts], ignore_index=True)
+    # transform() keeps the raw row labels; shift them to the raw row's position in the merged frame
+    offsets = np.cumsum([0] + [len(raw_part) for raw_part, _ in parts[:-1]])
+    cleaned_transactions = pd.concat([
+        cleaned_part.set_axis(cleaned_part.index + offset) for (_, cleaned_part), offset in zip(parts, offsets)
+    ])
+    # A cleaned row goes with the raw row it came from, as in an incremental ingest
+    keep = ~raw_transactions['row_hash'].duplicated().to_numpy()
+    raw_transactions = raw_transactions[keep]
+    cleaned_transactions = cleaned_transactions[keep[cleaned_transactions.index]]
+    # Files with different category sets concatenate to plain objects; restore the categoricals
+    for column in RAW_DTYPES:
+        raw_transactions[column] = raw_transactions[column].astype('category')
+    for column in CATEGORICAL_COLUMNS:
+        cleaned_transactions[column] = cleaned_transactions[column].astype('category')
+    return raw_transactions, cleaned_transactions, parsed_rows
+
+def ingest_files(files, connection_uri=None, incremental=False, workers=None, progress=None):
+    # Several exports (e.g. one per year or per family member) in one ingest: parsed in parallel,
+    # merged and deduplicated, then bulk-loaded in one pass. Returns the same counts as
+    # ingest_replace() or, with incremental=True, ingest_incremental().
+    progress = progress or _no_progress
+    raw_transactions, cleaned_transactions, total_rows = extract_files(files, workers, progress)
+    with ingest_transaction(connection_uri) as transaction:
+        if_exists = "replace"
+        if incremental:
+            stored = stored_fingerprints(connection_uri, transaction)
+            raw_transactions = raw_transactions[~raw_transactions['row_hash'].isin(stored)]
+            cleaned_transactions = cleaned_transactions[~cleaned_transactions['row_hash'].isin(stored)]
+            if_exists = "append"
+        if not (incremental and raw_transactions.empty):
+            progress("load")
+            load(raw_transactions, "raw_transactions", connection_uri, if_exists=if_exists, transaction=transaction)
+            load(cleaned_transactions, "transactions", connection_uri, if_exists=if_exists, transaction=transaction)
+            progress("load", loaded_rows=len(cleaned_transactions))
+            progress("rollups")
+            refresh_rollups(connection_uri, transaction=transaction)
+        progress("publish")
+    return total_rows, len(raw_transactions) if incremental else len(cleaned_transactions)
+
+# Ingest mode -> function(file, connection_uri, progress, **options)
+INGEST_MODES = {
+    "replace": lambda file, connection_uri, progress, chunksize=None: ingest_replace(file, connection_uri, progress),
+    "streaming": lambda file, connection_uri, progress, chunksize=DEFAULT_CHUNKSIZE: ingest_stream(file, connection_uri, chunksize, progress),
+    "incremental": lambda file, connection_uri, progress, chunksize=None: ingest_incremental(file, connection_uri, progress),
+}
+
+def ingest(file, mode="replace", connection_uri=None, chunksize=DEFAULT_CHUNKSIZE, progress=None, workers=None):
+    # Counts of one ingest in the given mode: (rows read, rows written to transactions), or for an
+    # incremental ingest (rows read, new rows). A list of files goes through ingest_files().
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode '{mode}'; expected one of {', '.join(INGEST_MODES)}.")
+    if isinstance(file, (list, tuple)):
+        if mode == "streaming":
+            raise ValueError("Streaming ingest reads a single file; use replace or incremental for several files.")
+        return ingest_files(file, connection_uri, mode == "incremental", workers, progress)
+    return INGEST_MODES[mode](file, connection_uri, progress, chunksize=chunksize)
+
+def drop(table, connection_uri=None):
+    db_engine = get_engine(connection_uri)
     with db_engine.connect() as connection:
         connection.execute(text(f"DROP TABLE IF EXISTS {table};"))
+        # Rollups are derived from transactions and must not outlive it
+        if table == "transactions":
+            for rollup in ROLLUP_PERIODS:
+                connection.execute(text(f"DROP TABLE IF EXISTS {rollup};"))
+        bump_data_version(connection)
         connection.commit()
+    drop_snapshot(table, connection_uri)
+    # Again after the snapshot is gone, as in ingest_transaction()
+    bump_data_generation(connection_uri)
+
+def _ensure_card_limits(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS card_limits (card_name TEXT PRIMARY KEY, credit_limit DOUBLE PRECISION NOT NULL)"
+    ))
+
+def card_limits(connection_uri=None):
+    # {card name: credit limit} set by the user. Not part of the loaded data: drop() and
+    # uploads leave it alone, and it is read directly instead of through the result cache.
+    with get_engine(connection_uri).begin() as conn:
+        _ensure_card_limits(conn)
+        rows = conn.execute(text("SELECT card_name, credit_limit FROM card_limits")).all()
+    return {card_name: float(credit_limit) for card_name, credit_limit in rows}
+
+def save_card_limit(card_name, credit_limit, connection_uri=None):
+    with get_engine(connection_uri).begin() as conn:
+        _ensure_card_limits(conn)
+        conn.execute(text(
+            "INSERT INTO card_limits (card_name, credit_limit) VALUES (:card_name, :credit_limit) "
+            "ON CONFLICT (card_name) DO UPDATE SET credit_limit = excluded.credit_limit"
+        ), {"card_name": card_name, "credit_limit": float(credit_limit)})
 
 # --- NEW: Helper functions for queries ---
 
-def get_monthly_cash_flow(connection_uri):
-    db_engine = create_engine(connection_uri)
+def get_monthly_cash_flow(connection_uri=None):
+    db_engine = get_engine(connection_uri)
     query = """
         SELECT
-            DATE_TRUNC('month', date) AS month,
+            period AS month,
             SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) -
             SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) AS cash_flow
-        FROM transactions
+        FROM rollup_monthly
         GROUP BY month
         ORDER BY month
     """
@@ -49,11 +811,12 @@ def get_monthly_cash_flow(connection_uri):
     return df
 
 def get_transactions_by_date(connection_uri, date):
-    db_engine = create_engine(connection_uri)
+    db_engine = get_engine(connection_uri)
     query = text("""
         SELECT *
         FROM transactions
-        WHERE DATE(date) = :date
+        WHERE date >= CAST(:date AS DATE)
+          AND date < CAST(:date AS DATE) + INTERVAL '1 day'
         ORDER BY date
     """)
     with db_engine.connect() as conn:
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Points kept per line series before a figure is built; roughly the pixel width of a wide chart,
+# so dropping the rest loses nothing visible (0 turns downsampling off)
+CHART_POINTS = int(os.environ.get("SPENDSENSE_CHART_POINTS", 1000))
+# "lttb" (Largest-Triangle-Three-Buckets, keeps the visual shape) or "minmax" (keeps every bucket's extremes)
+DOWNSAMPLE_METHOD = os.environ.get("SPENDSENSE_DOWNSAMPLE", "lttb").lower()
+# Figures drawing more points than this (over all series) are rendered with WebGL traces
+WEBGL_POINTS = int(os.environ.get("SPENDSENSE_WEBGL_POINTS", 2000))
+
+def _numeric_x(x):
+    # Distance along the x axis: timestamps and numbers as they are, anything else by position
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.to_numpy().astype('datetime64[ns]').astype('int64').astype('float64')
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype='float64')
+    return np.arange(len(x), dtype='float64')
+
+def lttb_indices(x, y, threshold):
+    # Positions of the `threshold` points LTTB keeps. The first and last point are always kept; in
+    # between, each bucket keeps the point forming the largest triangle with the point kept for the
+    # previous bucket and the average of the next bucket.
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype('int64')
+    selected = np.empty(threshold, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        following = slice(end, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        avg_x, avg_y = x[following].mean(), y[following].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y, threshold):
+    # Positions of the minimum and maximum of each of threshold/2 equal buckets, plus both ends
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    edges = np.linspace(0, n, threshold // 2 + 1).astype('int64')
+    selected = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        selected += [start + int(bucket.argmin()), start + int(bucket.argmax())]
+    return np.unique(selected)
+
+def downsample(df, x_col, y_cols, points=None, method=None):
+    # Rows of `df` (sorted by x_col) needed to draw each of `y_cols` with about `points` points.
+    # Every series picks its own rows; the union is kept, so all series stay exact at those x values.
+    points = CHART_POINTS if points is None else points
+    method = DOWNSAMPLE_METHOD if method is None else method
+    if not points or len(df) <= points or method not in ("lttb", "minmax"):
+        return df
+    x = _numeric_x(df[x_col])
+    keep = []
+    for column in ([y_cols] if isinstance(y_cols, str) else y_cols):
+        # Gaps must not win the triangle/extreme comparisons; they are drawn as gaps either way
+        y = np.nan_to_num(df[column].to_numpy(dtype='float64'))
+        keep.append(lttb_indices(x, y, points) if method == "lttb" else minmax_indices(y, points))
+    return df.iloc[np.unique(np.concatenate(keep))] if keep else df
+
+def use_webgl(points_drawn):
+    return points_drawn > WEBGL_POINTS
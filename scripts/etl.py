@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import sys
+import time
+from database import DEFAULT_CHUNKSIZE, INGEST_MODES, ingest, refresh_rollups
+from metrics import metrics
+
+# --- HEADLESS ETL ---
+# The Data section's pipeline without the UI (nothing here imports Streamlit, Plotly or PIL), for
+# cron jobs and for timing the pipeline on its own. Run from the repository root, e.g.
+#   python scripts/etl.py ingest export.csv
+#   python scripts/etl.py ingest 2023.csv 2024.csv --mode incremental --workers 4
+#   python scripts/etl.py ingest huge.csv --mode streaming --chunksize 100000
+# Stage timings are printed when the run ends (--json for a machine-readable line), and recorded
+# in the metrics sinks (SPENDSENSE_METRICS_LOG / SPENDSENSE_METRICS_PROM) like the app's.
+
+# Exit statuses (argparse exits with 2 on a usage error, e.g. a missing input file)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+class StageTimer:
+    # progress() callback for database.ingest(): wall time per stage and the latest row counts
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.stage = None
+        self.stage_seconds = {}
+        self.counts = {"parsed_rows": 0, "transformed_rows": 0, "loaded_rows": 0}
+        self._stage_started = None
+
+    def __call__(self, stage, **counts):
+        if stage != self.stage:
+            self.finish()
+            self.stage = stage
+            self._stage_started = time.perf_counter()
+        self.counts.update(counts)
+        if self.verbose:
+            totals = ", ".join(f"{name} {value:,}" for name, value in counts.items())
+            print(f"  {stage}{': ' + totals if totals else ''}", file=sys.stderr)
+
+    def finish(self):
+        if self.stage is not None:
+            seconds = time.perf_counter() - self._stage_started
+            self.stage_seconds[self.stage] = self.stage_seconds.get(self.stage, 0.0) + seconds
+            metrics.record_section(f"ingest:{self.stage}", seconds)
+            self.stage = None
+
+def report(result, as_json=False):
+    if as_json:
+        print(json.dumps(result))
+        return
+    width = max(len(stage) for stage in [*result["stages"], "total"])
+    for stage, seconds in result["stages"].items():
+        print(f"{stage:<{width}}  {seconds:8.3f}s")
+    print(f"{'total':<{width}}  {result['seconds']:8.3f}s")
+    if "rows_read" in result:
+        print(f"{result['rows_read']:,} rows read, {result['rows_written']:,} rows written "
+              f"({result['rows_per_sec']:,.0f} rows/s)")
+
+def run_ingest(args):
+    timer = StageTimer(args.verbose)
+    files = args.files if len(args.files) > 1 else args.files[0]
+    start = time.perf_counter()
+    try:
+        rows_read, rows_written = ingest(files, args.mode, args.uri, args.chunksize, timer, args.workers)
+    finally:
+        timer.finish()
+    seconds = time.perf_counter() - start
+    return {
+        "command": "ingest",
+        "mode": args.mode,
+        "files": args.files,
+        "rows_read": rows_read,
+        "rows_written": rows_written,
+        "rows_per_sec": rows_read / seconds if seconds else None,
+        "stages": timer.stage_seconds,
+        "seconds": seconds,
+    }
+
+def run_refresh_rollups(args):
+    start = time.perf_counter()
+    refresh_rollups(args.uri)
+    seconds = time.perf_counter() - start
+    metrics.record_section("ingest:rollups", seconds)
+    return {"command": "refresh-rollups", "stages": {"rollups": seconds}, "seconds": seconds}
+
+COMMANDS = {
+    "ingest": run_ingest,
+    "refresh-rollups": run_refresh_rollups,
+}
+
+def check_args(parser, args):
+    if args.command == "ingest":
+        missing = [file for file in args.files if not os.path.isfile(file)]
+        if missing:
+            parser.error(f"no such file: {', '.join(missing)}")
+        if args.mode == "streaming" and len(args.files) > 1:
+            parser.error("streaming ingest reads a single file; use replace or incremental for several files")
+        if args.chunksize < 1 or (args.workers is not None and args.workers < 1):
+            parser.error("--chunksize and --workers must be at least 1")
+
+def common_options(argument_default=None):
+    # Options every command takes, as a parent parser
+    parser = argparse.ArgumentParser(add_help=False, argument_default=argument_default)
+    parser.add_argument("--uri", help="database URI (defaults to SPENDSENSE_DATABASE_URI / SPENDSENSE_BACKEND)")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print progress to stderr as stages run")
+    return parser
+
+def build_parser():
+    # The common options go before or after the command. The commands' copies are left unset
+    # (SUPPRESS) when not given, so they never overwrite a value given before the command.
+    parser = argparse.ArgumentParser(description="Load Bluecoins CSV exports into the SpendSense database.",
+                                     parents=[common_options()])
+    command_options = common_options(argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", parents=[command_options],
+                                        help="extract, transform and load one or more exports")
+    ingest_parser.add_argument("files", nargs="+", help="Bluecoins CSV exports (several are merged and deduplicated)")
+    ingest_parser.add_argument("--mode", choices=list(INGEST_MODES), default="replace",
+                               help="replace all data, stream one large file in chunks, or add only new rows")
+    ingest_parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk in streaming mode")
+    ingest_parser.add_argument("--workers", type=int,
+                               help="worker processes for several files (default SPENDSENSE_INGEST_PROCESSES or the CPU count)")
+
+    commands.add_parser("refresh-rollups", parents=[command_options],
+                        help="rebuild the rollup tables from the stored transactions")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    try:
+        result = COMMANDS[args.command](args)
+    except KeyboardInterrupt:
+        # The ingest transaction has rolled back; the stored data is unchanged
+        print("Interrupted; nothing was published.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"error: {args.command} failed: {str(e)}", file=sys.stderr)
+        return EXIT_FAILED
+    finally:
+        metrics.flush(None)
+    report(result, args.json)
+    return EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import DEFAULT_CHUNKSIZE, ingest
+from metrics import metrics
+
+# Ingest jobs run at the same time (they serialize on the database anyway; more only helps
+# when they go to different databases)
+INGEST_WORKERS = int(os.environ.get("SPENDSENSE_INGEST_WORKERS", 1))
+# Finished jobs kept for status lookups
+JOB_HISTORY = int(os.environ.get("SPENDSENSE_JOB_HISTORY", 20))
+# Uploads are copied here, so a job does not depend on the request that uploaded the file
+SPOOL_DIR = os.environ.get("SPENDSENSE_SPOOL_DIR", tempfile.gettempdir())
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobCancelled(Exception):
+    pass
+
+class IngestJob:
+    # One background ingest. The worker updates it through progress(), which database.ingest()
+    # calls between stages and chunks; readers take status_dict() snapshots.
+
+    def __init__(self, paths, mode, connection_uri, chunksize, workers, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.paths = paths
+        self.mode = mode
+        self.connection_uri = connection_uri
+        self.chunksize = chunksize
+        self.workers = workers
+        self.name = name
+        self.status = "queued"
+        self.stage = None
+        self.counts = {"parsed_rows": 0, "transformed_rows": 0, "loaded_rows": 0}
+        self.stage_seconds = {}
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._stage_started = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def progress(self, stage, **counts):
+        # Raising here aborts the ingest, which rolls its transaction back
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+        with self._lock:
+            if stage != self.stage:
+                self._end_stage()
+                self.stage = stage
+                self._stage_started = time.perf_counter()
+            self.counts.update(counts)
+
+    def _end_stage(self):
+        if self.stage is not None:
+            seconds = time.perf_counter() - self._stage_started
+            self.stage_seconds[self.stage] = self.stage_seconds.get(self.stage, 0.0) + seconds
+            metrics.record_section(f"ingest:{self.stage}", seconds)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self):
+        with self._lock:
+            if self._cancel.is_set():
+                self.status = "cancelled"
+                self.finished = time.time()
+                return
+            self.status = "running"
+            self.started = time.time()
+        try:
+            # Several files are parsed in parallel and merged (database.ingest_files)
+            files = self.paths if len(self.paths) > 1 else self.paths[0]
+            result = ingest(files, self.mode, self.connection_uri, self.chunksize, self.progress, self.workers)
+            status, error = "succeeded", None
+        except JobCancelled:
+            result, status, error = None, "cancelled", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        finally:
+            for path in self.paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        with self._lock:
+            self._end_stage()
+            self.stage = None
+            self.result = result
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+        metrics.record_section(f"ingest:{status}", self.finished - self.started)
+
+    def status_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "mode": self.mode,
+                "files": len(self.paths),
+                "status": self.status,
+                "stage": self.stage,
+                **self.counts,
+                "stage_seconds": dict(self.stage_seconds),
+                "result": self.result,
+                "error": self.error,
+                "submitted": self.submitted,
+                "started": self.started,
+                "finished": self.finished,
+                "cancel_requested": self._cancel.is_set(),
+            }
+
+def _spool(file):
+    fd, path = tempfile.mkstemp(prefix="spendsense-ingest-", suffix=".csv", dir=SPOOL_DIR)
+    with os.fdopen(fd, "wb") as spool:
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as source:
+                shutil.copyfileobj(source, spool)
+        else:
+            file.seek(0)
+            shutil.copyfileobj(file, spool)
+    return path
+
+class IngestRunner:
+    # Runs ingests on worker threads and keeps the recent jobs by id. Shared by every session of
+    # the app process, so a job keeps running (and can be looked up) after its page is closed.
+
+    def __init__(self, workers=INGEST_WORKERS, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spendsense-ingest")
+        self._history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, files, mode="replace", connection_uri=None, chunksize=DEFAULT_CHUNKSIZE, workers=None, name=None):
+        # `files` is one file or a list; each a path or a file-like object (an upload). Either way
+        # the job reads its own copies, which also lets worker processes open them by path.
+        files = files if isinstance(files, (list, tuple)) else [files]
+        paths = [_spool(file) for file in files]
+        name = name or ", ".join(getattr(file, "name", str(file)) for file in files)
+        job = IngestJob(paths, mode, connection_uri, chunksize, workers, name)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(job.run)
+        return job.id
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history size; active ones are always kept
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.status_dict() if job is not None else None
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def jobs(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.status_dict() for job in reversed(jobs)]
+
+    def active(self):
+        return [job for job in self.jobs() if job["status"] in ACTIVE_STATUSES]
+
+    def wait(self, job_id, timeout=None, interval=0.1):
+        # Status once the job has finished (or the timeout has passed); for scripts and tests
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.get(job_id)
+            if status is None or status["status"] not in ACTIVE_STATUSES:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(interval)
+
+ingest_runner = IngestRunner()
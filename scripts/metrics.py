@@ -0,0 +1,127 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Recent events kept in memory for the debug panel and the JSON lines export
+EVENT_HISTORY = int(os.environ.get("SPENDSENSE_METRICS_HISTORY", 5000))
+# Optional sinks written at the end of every rerun: the rerun's events appended as JSON lines, and
+# the cumulative counters in Prometheus text format (for node_exporter's textfile collector)
+METRICS_LOG_PATH = os.environ.get("SPENDSENSE_METRICS_LOG")
+METRICS_PROM_PATH = os.environ.get("SPENDSENSE_METRICS_PROM")
+
+# Id of the rerun the current code runs for; QueryBatch copies it into its worker threads
+_current_rerun = contextvars.ContextVar("spendsense_rerun", default=None)
+
+def current_rerun():
+    return _current_rerun.get()
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class Metrics:
+    # Process-wide record of query and render timings. Each event is also folded into cumulative
+    # per-query / per-section totals, which is what the Prometheus export reports.
+    #   query events:   wall time, rows and in-memory bytes of the result, and where it came from
+    #                   ("hit"/"miss" in the result cache, "snapshot", "cube" or "error")
+    #   section events: wall time of a named block of the script (a tab, a chart, the whole rerun)
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=history)
+        self._queries = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+        self._sections = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+
+    def _record(self, event):
+        event["rerun"] = current_rerun()
+        event["time"] = time.time()
+        with self._lock:
+            self._events.append(event)
+            if event["kind"] == "query":
+                totals = self._queries[(event["query"], event["cache"])]
+                totals["rows"] += event["rows"]
+                totals["bytes"] += event["bytes"]
+            else:
+                totals = self._sections[event["section"]]
+            totals["calls"] += 1
+            totals["seconds"] += event["seconds"]
+
+    def record_query(self, query_name, seconds, rows=0, nbytes=0, cache="miss"):
+        self._record({"kind": "query", "query": query_name, "cache": cache, "seconds": seconds, "rows": rows, "bytes": nbytes})
+
+    def record_section(self, section, seconds):
+        self._record({"kind": "section", "section": section, "seconds": seconds})
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_section(name, time.perf_counter() - start)
+
+    @contextmanager
+    def rerun(self):
+        # Tags everything recorded inside with a new rerun id and times the rerun as a whole
+        rerun_id = uuid.uuid4().hex[:12]
+        token = _current_rerun.set(rerun_id)
+        try:
+            with self.section("rerun"):
+                yield rerun_id
+        finally:
+            _current_rerun.reset(token)
+            self.flush(rerun_id)
+
+    def events(self, rerun_id=None):
+        with self._lock:
+            events = list(self._events)
+        if rerun_id is not None:
+            events = [e for e in events if e["rerun"] == rerun_id]
+        return events
+
+    def to_json_lines(self, events=None):
+        events = self.events() if events is None else events
+        return "".join(json.dumps(e, default=str) + "\n" for e in events)
+
+    def to_prometheus(self):
+        with self._lock:
+            queries = {key: dict(totals) for key, totals in self._queries.items()}
+            sections = {key: dict(totals) for key, totals in self._sections.items()}
+        lines = []
+        for metric, field, help_text in (
+            ("spendsense_query_calls_total", "calls", "Named query calls, by where the result came from."),
+            ("spendsense_query_seconds_total", "seconds", "Wall time spent answering named queries."),
+            ("spendsense_query_rows_total", "rows", "Rows returned by named queries."),
+            ("spendsense_query_bytes_total", "bytes", "In-memory bytes of the DataFrames returned by named queries."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (query_name, cache), totals in sorted(queries.items()):
+                lines.append(f'{metric}{{query="{_label(query_name)}",cache="{_label(cache)}"}} {totals[field]}')
+        for metric, field, help_text in (
+            ("spendsense_section_calls_total", "calls", "Timed script sections run (\"rerun\" is the whole script)."),
+            ("spendsense_section_seconds_total", "seconds", "Wall time spent in timed script sections."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for section, totals in sorted(sections.items()):
+                lines.append(f'{metric}{{section="{_label(section)}"}} {totals[field]}')
+        return "\n".join(lines) + "\n"
+
+    def flush(self, rerun_id):
+        # Write the configured sinks; a failing sink must never break the app
+        try:
+            if METRICS_LOG_PATH:
+                with open(METRICS_LOG_PATH, "a") as f:
+                    f.write(self.to_json_lines(self.events(rerun_id)))
+            if METRICS_PROM_PATH:
+                staging = f"{METRICS_PROM_PATH}.{os.getpid()}.tmp"
+                with open(staging, "w") as f:
+                    f.write(self.to_prometheus())
+                os.replace(staging, METRICS_PROM_PATH)
+        except OSError as e:
+            print(f"Error writing metrics: {str(e)}")
+
+metrics = Metrics()
@@ -4,87 +4,72 @@ SELECT * FROM raw_transactions;
 --@name: transactions
 SELECT * FROM transactions;
 
---@name: monthly_amount_over_time
-SELECT
-    month,
-    SUM(amount) OVER (ORDER BY month) AS net_worth,
-    SUM(CASE WHEN account = 'Wallet' THEN amount ELSE 0 END) OVER (ORDER BY month) AS wallet,
-    SUM(CASE WHEN account = 'Union Bank' THEN amount ELSE 0 END) OVER (ORDER BY month) AS unionbank,
-    SUM(CASE WHEN account = 'Seabank' THEN amount ELSE 0 END) OVER (ORDER BY month) AS seabank,
-    SUM(CASE WHEN account = 'GCash' THEN amount ELSE 0 END) OVER (ORDER BY month) AS gcash,
-    SUM(CASE WHEN account = 'Maya' THEN amount ELSE 0 END) OVER (ORDER BY month) AS maya,
-    SUM(CASE WHEN account = 'GrabPay' THEN amount ELSE 0 END) OVER (ORDER BY month) AS grabpay,
-    SUM(CASE WHEN account = 'ShopeePay' THEN amount ELSE 0 END) OVER (ORDER BY month) AS shopeepay,
-    SUM(CASE WHEN account = 'Binance' THEN amount ELSE 0 END) OVER (ORDER BY month) AS binance,
-    SUM(CASE WHEN account = 'Ronin' THEN amount ELSE 0 END) OVER (ORDER BY month) AS ronin
-FROM
-    (SELECT
-		DATE_TRUNC('month', date) AS month,
-		account,
-		SUM(ROUND(amount)) AS amount
-	FROM
-		transactions
-	GROUP BY 
-		month, account
-	ORDER BY
-		month);
-
---@name: weekly_amount_over_time
-SELECT
-    week,
-    SUM(amount) OVER (ORDER BY week) AS net_worth,
-    SUM(CASE WHEN account = 'Wallet' THEN amount ELSE 0 END) OVER (ORDER BY week) AS wallet,
-    SUM(CASE WHEN account = 'Union Bank' THEN amount ELSE 0 END) OVER (ORDER BY week) AS unionbank,
-    SUM(CASE WHEN account = 'Seabank' THEN amount ELSE 0 END) OVER (ORDER BY week) AS seabank,
-    SUM(CASE WHEN account = 'GCash' THEN amount ELSE 0 END) OVER (ORDER BY week) AS gcash,
-    SUM(CASE WHEN account = 'Maya' THEN amount ELSE 0 END) OVER (ORDER BY week) AS maya,
-    SUM(CASE WHEN account = 'GrabPay' THEN amount ELSE 0 END) OVER (ORDER BY week) AS grabpay,
-    SUM(CASE WHEN account = 'ShopeePay' THEN amount ELSE 0 END) OVER (ORDER BY week) AS shopeepay,
-    SUM(CASE WHEN account = 'Binance' THEN amount ELSE 0 END) OVER (ORDER BY week) AS binance,
-    SUM(CASE WHEN account = 'Ronin' THEN amount ELSE 0 END) OVER (ORDER BY week) AS ronin
-FROM
-    (SELECT
-		DATE_TRUNC('week', date) + INTERVAL '6 days' AS week,
-		account,
-		SUM(ROUND(amount)) AS amount
-	FROM
-		transactions
-	GROUP BY 
-		week, account
-	ORDER BY
-		week);
-
---@name: daily_amount_over_time
-SELECT
-    day,
-    SUM(amount) OVER (ORDER BY day) AS net_worth,
-    SUM(CASE WHEN account = 'Wallet' THEN amount ELSE 0 END) OVER (ORDER BY day) AS wallet,
-    SUM(CASE WHEN account = 'Union Bank' THEN amount ELSE 0 END) OVER (ORDER BY day) AS unionbank,
-    SUM(CASE WHEN account = 'Seabank' THEN amount ELSE 0 END) OVER (ORDER BY day) AS seabank,
-    SUM(CASE WHEN account = 'GCash' THEN amount ELSE 0 END) OVER (ORDER BY day) AS gcash,
-    SUM(CASE WHEN account = 'Maya' THEN amount ELSE 0 END) OVER (ORDER BY day) AS maya,
-    SUM(CASE WHEN account = 'GrabPay' THEN amount ELSE 0 END) OVER (ORDER BY day) AS grabpay,
-    SUM(CASE WHEN account = 'ShopeePay' THEN amount ELSE 0 END) OVER (ORDER BY day) AS shopeepay,
-    SUM(CASE WHEN account = 'Binance' THEN amount ELSE 0 END) OVER (ORDER BY day) AS binance,
-    SUM(CASE WHEN account = 'Ronin' THEN amount ELSE 0 END) OVER (ORDER BY day) AS ronin
-FROM
-    (SELECT
-		DATE(date) AS day,
-		account,
-		SUM(ROUND(amount)) AS amount
-	FROM
-		transactions
-	GROUP BY 
-		day, account
-	ORDER BY
-		day);
+--@name: monthly_account_amounts
+SELECT
+    period AS month,
+    account,
+    SUM(rounded_amount) AS amount
+FROM
+    rollup_monthly
+GROUP BY
+    month, account
+ORDER BY
+    month;
+
+--@name: weekly_account_amounts
+SELECT
+    period + INTERVAL '6 days' AS week,
+    account,
+    SUM(rounded_amount) AS amount
+FROM
+    rollup_weekly
+GROUP BY
+    week, account
+ORDER BY
+    week;
+
+--@name: weekly_account_amounts @sqlite
+SELECT
+    DATE(period, '+6 days') AS week,
+    account,
+    SUM(rounded_amount) AS amount
+FROM
+    rollup_weekly
+GROUP BY
+    week, account
+ORDER BY
+    week;
+
+--@name: daily_account_amounts
+SELECT
+    period AS day,
+    account,
+    SUM(rounded_amount) AS amount
+FROM
+    rollup_daily
+GROUP BY
+    day, account
+ORDER BY
+    day;
+
+--@name: fact_cube
+SELECT
+    period AS day,
+    account,
+    category,
+    type,
+    amount,
+    rounded_amount,
+    transactions
+FROM
+    rollup_daily;
 
 --@name: expenses_per_category
 SELECT
     category,
     ROUND(ABS(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END))) as expenses
 FROM
-    transactions
+    rollup_monthly
 GROUP BY
     category
 HAVING
@@ -97,7 +82,7 @@ SELECT
     category,
     ROUND(ABS(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END))) as income
 FROM
-    transactions
+    rollup_monthly
 GROUP BY
     category
 HAVING
@@ -107,49 +92,122 @@ ORDER BY
 
 --@name: monthly_expenses
 SELECT
-    TO_CHAR(DATE_TRUNC('month', date), 'FMMonth YYYY') AS month,
+    TO_CHAR(period, 'FMMonth YYYY') AS month,
     ABS(ROUND(SUM(amount))) AS expenses
 FROM 
-    transactions
+    rollup_monthly
 WHERE
     type = 'expense'
 GROUP BY
-    DATE_TRUNC('month', date)
+    period
 ORDER BY
-    DATE_TRUNC('month', date);
+    period;
+
+--@name: monthly_expenses @duckdb
+SELECT
+    strftime(period, '%B %Y') AS month,
+    ABS(ROUND(SUM(amount))) AS expenses
+FROM 
+    rollup_monthly
+WHERE
+    type = 'expense'
+GROUP BY
+    period
+ORDER BY
+    period;
+
+--@name: monthly_expenses @sqlite
+SELECT
+    CASE CAST(strftime('%m', period) AS INTEGER)
+        WHEN 1 THEN 'January' WHEN 2 THEN 'February' WHEN 3 THEN 'March' WHEN 4 THEN 'April'
+        WHEN 5 THEN 'May' WHEN 6 THEN 'June' WHEN 7 THEN 'July' WHEN 8 THEN 'August'
+        WHEN 9 THEN 'September' WHEN 10 THEN 'October' WHEN 11 THEN 'November' WHEN 12 THEN 'December'
+    END || ' ' || strftime('%Y', period) AS month,
+    ABS(ROUND(SUM(amount))) AS expenses
+FROM 
+    rollup_monthly
+WHERE
+    type = 'expense'
+GROUP BY
+    period
+ORDER BY
+    period;
 
 --@name: monthly_income
 SELECT
-	TO_CHAR(DATE_TRUNC('month', date), 'FMMonth YYYY') AS month,
+	TO_CHAR(period, 'FMMonth YYYY') AS month,
+	ROUND(SUM(amount)) AS income
+FROM
+	rollup_monthly
+WHERE
+	type = 'income'
+GROUP BY
+	period
+ORDER BY 
+	period;
+
+--@name: monthly_income @duckdb
+SELECT
+	strftime(period, '%B %Y') AS month,
 	ROUND(SUM(amount)) AS income
 FROM
-	transactions
+	rollup_monthly
 WHERE
 	type = 'income'
 GROUP BY
-	DATE_TRUNC('month', date)
+	period
 ORDER BY 
-	DATE_TRUNC('month', date);
+	period;
+
+--@name: monthly_income @sqlite
+SELECT
+	CASE CAST(strftime('%m', period) AS INTEGER)
+	    WHEN 1 THEN 'January' WHEN 2 THEN 'February' WHEN 3 THEN 'March' WHEN 4 THEN 'April'
+	    WHEN 5 THEN 'May' WHEN 6 THEN 'June' WHEN 7 THEN 'July' WHEN 8 THEN 'August'
+	    WHEN 9 THEN 'September' WHEN 10 THEN 'October' WHEN 11 THEN 'November' WHEN 12 THEN 'December'
+	END || ' ' || strftime('%Y', period) AS month,
+	ROUND(SUM(amount)) AS income
+FROM
+	rollup_monthly
+WHERE
+	type = 'income'
+GROUP BY
+	period
+ORDER BY 
+	period;
 
 --@name: weekly_expenses
 SELECT
-    DATE_TRUNC('week', date) + INTERVAL '6 days' AS week,
+    period + INTERVAL '6 days' AS week,
     ROUND(ABS(SUM(amount))) AS expenses
 FROM
-    transactions
+    rollup_weekly
 WHERE
     type = 'expense'
 GROUP BY
-    DATE_TRUNC('week', date)
+    period
 ORDER BY
-    DATE_TRUNC('week', date);
+    period;
 	
+--@name: weekly_expenses @sqlite
+SELECT
+    DATE(period, '+6 days') AS week,
+    ROUND(ABS(SUM(amount))) AS expenses
+FROM
+    rollup_weekly
+WHERE
+    type = 'expense'
+GROUP BY
+    period
+ORDER BY
+    period;
+
 --@name: daily_expenses
 SELECT
-    DATE(date) AS day,
+    period AS day,
 	ROUND(ABS(SUM(amount))) as expenses
 FROM
-	transactions
+	rollup_daily
 WHERE
 	type = 'expense'
 GROUP BY
@@ -162,7 +220,7 @@ SELECT
 	account,
 	ROUND(ABS(SUM(amount))) as amount
 FROM
-	transactions
+	rollup_monthly
 WHERE
 	type = 'expense'
 GROUP BY
@@ -175,7 +233,7 @@ SELECT
 	account,
 	ROUND(ABS(SUM(amount))) as amount
 FROM
-	transactions
+	rollup_monthly
 WHERE
 	type = 'income'
 GROUP BY
@@ -185,41 +243,97 @@ ORDER BY
 
 --@name: monthly_cash_flow
 SELECT
-    TO_CHAR(DATE_TRUNC('month', date), 'FMMonth YYYY') AS month,
+    TO_CHAR(period, 'FMMonth YYYY') AS month,
     SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) -
     SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) AS cash_flow
 FROM
-    transactions
+    rollup_monthly
 GROUP BY
-    DATE_TRUNC('month', date)
+    period
 ORDER BY
-    DATE_TRUNC('month', date);
+    period;
+
+--@name: monthly_cash_flow @duckdb
+SELECT
+    strftime(period, '%B %Y') AS month,
+    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) -
+    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) AS cash_flow
+FROM
+    rollup_monthly
+GROUP BY
+    period
+ORDER BY
+    period;
+
+--@name: monthly_cash_flow @sqlite
+SELECT
+    CASE CAST(strftime('%m', period) AS INTEGER)
+        WHEN 1 THEN 'January' WHEN 2 THEN 'February' WHEN 3 THEN 'March' WHEN 4 THEN 'April'
+        WHEN 5 THEN 'May' WHEN 6 THEN 'June' WHEN 7 THEN 'July' WHEN 8 THEN 'August'
+        WHEN 9 THEN 'September' WHEN 10 THEN 'October' WHEN 11 THEN 'November' WHEN 12 THEN 'December'
+    END || ' ' || strftime('%Y', period) AS month,
+    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) -
+    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) AS cash_flow
+FROM
+    rollup_monthly
+GROUP BY
+    period
+ORDER BY
+    period;
 
 --@name: transactions_by_date
 SELECT *
 FROM transactions
-WHERE DATE(date) = :date
+WHERE date >= CAST(:date AS DATE)
+  AND date < CAST(:date AS DATE) + INTERVAL '1 day'
+ORDER BY date;
+
+--@name: transactions_by_date @sqlite
+SELECT *
+FROM transactions
+WHERE date >= DATE(:date)
+  AND date < DATE(:date, '+1 day')
 ORDER BY date;
 
 --@name: daily_net_summary_last_n_days
 SELECT date,
        COALESCE(SUM(amount), 0) AS net_amount
 FROM transactions
-WHERE date >= CURRENT_DATE - INTERVAL '30 days'
+WHERE date >= CAST(:today AS DATE) - INTERVAL '30 days'
+GROUP BY date
+ORDER BY date;
+
+--@name: daily_net_summary_last_n_days @sqlite
+SELECT date,
+       COALESCE(SUM(amount), 0) AS net_amount
+FROM transactions
+WHERE date >= DATE(:today, '-30 days')
 GROUP BY date
 ORDER BY date;
 
 --@name: credit_card_summary
 SELECT 
     account AS card_name,
-    CAST(COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0) AS FLOAT) AS spent,
-    CAST(1500 AS FLOAT) AS "limit"
+    CAST(COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0) AS FLOAT) AS spent
+FROM transactions
+WHERE is_card
+  AND date >= date_trunc('month', CAST(:today AS TIMESTAMP))
+GROUP BY account;
+
+--@name: credit_card_summary @duckdb
+SELECT 
+    account AS card_name,
+    CAST(COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0) AS DOUBLE) AS spent
 FROM transactions
-WHERE (lower(account) LIKE '%credit%' 
-       OR lower(account) LIKE '%visa%'
-       OR lower(account) LIKE '%mastercard%'
-       OR lower(account) LIKE '%amex%'
-       OR lower(account) LIKE '%american express%'
-       OR lower(account) LIKE '%discover%')
-  AND date >= date_trunc('month', CURRENT_DATE)
+WHERE is_card
+  AND date >= date_trunc('month', CAST(:today AS DATE))
 GROUP BY account;
+
+--@name: credit_card_summary @sqlite
+SELECT 
+    account AS card_name,
+    CAST(COALESCE(SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END), 0) AS REAL) AS spent
+FROM transactions
+WHERE is_card
+  AND date >= DATE(:today, 'start of month')
+GROUP BY account;
\ No newline at end of file
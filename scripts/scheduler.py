@@ -0,0 +1,45 @@
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Shared by every session and kept below the connection pool size (see engine.py)
+QUERY_WORKERS = int(os.environ.get("SPENDSENSE_QUERY_WORKERS", 4))
+QUERY_TIMEOUT = float(os.environ.get("SPENDSENSE_QUERY_TIMEOUT", 30))
+
+_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="spendsense-query")
+
+class QueryBatch:
+    # Runs a set of independent queries concurrently and hands back each result as soon as it is ready.
+    # Tasks must not call Streamlit; rendering stays in the script thread.
+
+    def __init__(self, timeout=QUERY_TIMEOUT):
+        self.timeout = timeout
+        self._futures = {}
+        self._deadlines = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        # Tasks run in the submitting thread's context, so metrics they record carry its rerun id
+        self._futures[key] = _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        self._deadlines[key] = time.monotonic() + self.timeout
+
+    def as_completed(self):
+        # Yields (key, result, error) in completion order. A task still running past its
+        # deadline yields a TimeoutError, so one slow query cannot hold up the others. cancel()
+        # only drops tasks that have not started; a running query is stopped by the database
+        # (engine.read_connection), which frees its worker for later reruns.
+        pending = dict(self._futures)
+        while pending:
+            now = time.monotonic()
+            for key in [k for k, f in pending.items() if self._deadlines[k] <= now and not f.done()]:
+                pending.pop(key).cancel()
+                yield key, None, TimeoutError(f"query did not finish within {self.timeout:g}s")
+            if not pending:
+                break
+
+            next_deadline = min(self._deadlines[k] for k in pending)
+            done, _ = wait(list(pending.values()), timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+            for key in [k for k, f in pending.items() if f in done]:
+                future = pending.pop(key)
+                error = future.exception()
+                yield key, None if error is not None else future.result(), error
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+import pandas as pd
+from sqlalchemy.engine import make_url
+from engine import get_connection_uri, rounds_half_to_even
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # without pyarrow there is no snapshot and every read goes to the database
+    pa = pc = None
+
+# Columnar copy of the cleaned transactions, one Arrow IPC file per month, written by
+# database.load() next to the database copy. Reads memory-map the files, so the dashboard can be
+# built without the database (and keeps working read-only while it is down).
+SNAPSHOT_DIR = os.environ.get(
+    "SPENDSENSE_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot"),
+)
+SNAPSHOT_ENABLED = os.environ.get("SPENDSENSE_SNAPSHOT", "1").lower() in ("1", "true", "yes", "on")
+# Tables database.load() mirrors into the snapshot
+SNAPSHOT_TABLES = ("transactions",)
+# Partition for rows without a date
+NULL_MONTH = "none"
+
+def snapshot_enabled():
+    return SNAPSHOT_ENABLED and pa is not None
+
+def snapshot_path(table, connection_uri=None):
+    # One snapshot per database, so loading a scratch database never replaces the app's snapshot
+    uri = make_url(connection_uri or get_connection_uri()).render_as_string(hide_password=False)
+    return os.path.join(SNAPSHOT_DIR, hashlib.sha1(uri.encode()).hexdigest()[:12], table)
+
+def _partition_file(path, month):
+    return os.path.join(path, f"month={month}.arrow")
+
+def _to_arrow(df):
+    # Fixed column types, so partitions written by different loads can be read back as one table
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in table.schema:
+        column_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        if pa.types.is_string(column_type) or pa.types.is_large_string(column_type) or pa.types.is_null(column_type):
+            column_type = pa.string()
+        elif pa.types.is_timestamp(column_type):
+            column_type = pa.timestamp("us")
+        elif pa.types.is_integer(column_type):
+            column_type = pa.int64()
+        fields.append(pa.field(field.name, column_type))
+    return table.cast(pa.schema(fields))
+
+def _write_ipc(table, file):
+    # Written next to the target and renamed over it, so readers see the old or the new file
+    staging = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(staging, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(staging, file)
+
+def _read_ipc(file):
+    # The table's buffers point into the memory map; nothing is copied until a column is used
+    with pa.memory_map(file, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _swap_in(staging, path):
+    # Replace the snapshot directory at `path` with the one built at `staging`
+    previous = f"{path}.old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.isdir(path):
+        os.rename(path, previous)
+    os.rename(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+def stage_snapshot(table, connection_uri=None):
+    # Empty directory beside the snapshot, for a new one that publish_snapshot() swaps in later
+    staging = f"{snapshot_path(table, connection_uri)}.{uuid.uuid4().hex[:12]}.staging"
+    os.makedirs(staging)
+    return staging
+
+def publish_snapshot(staging, table, connection_uri=None):
+    _swap_in(staging, snapshot_path(table, connection_uri))
+
+def write_snapshot(df, table, connection_uri=None, if_exists="replace", path=None):
+    # `path` writes somewhere other than the published snapshot (a stage_snapshot() directory)
+    path = path or snapshot_path(table, connection_uri)
+    rows = _to_arrow(df)
+    # yyyymm per row (0 for a missing date); formatting per row with strftime is far slower
+    keys = (df['date'].dt.year * 100 + df['date'].dt.month).fillna(0).astype('int64').to_numpy()
+    partitions = {
+        f"{key // 100:04d}-{key % 100:02d}" if key else NULL_MONTH: positions
+        for key, positions in pd.Series(keys).groupby(keys).indices.items()
+    }
+
+    if if_exists == "replace":
+        # Build the new snapshot beside the old one and swap the directories
+        staging = f"{path}.loading"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for month, positions in partitions.items():
+            _write_ipc(rows.take(positions), _partition_file(staging, month))
+        _swap_in(staging, path)
+    else:
+        # Appends rewrite only the months the new rows fall into
+        os.makedirs(path, exist_ok=True)
+        for month, positions in partitions.items():
+            file = _partition_file(path, month)
+            part = rows.take(positions)
+            if os.path.exists(file):
+                part = pa.concat_tables([_read_ipc(file), part], promote_options="default")
+            _write_ipc(part, file)
+
+def update_snapshot(df, table, connection_uri=None, if_exists="replace"):
+    # Called by database.load() after the database write
+    if not snapshot_enabled() or table not in SNAPSHOT_TABLES:
+        return
+    try:
+        write_snapshot(df, table, connection_uri, if_exists)
+    except Exception as e:
+        # A snapshot that missed a load would serve stale data; remove it so reads use the database
+        print(f"Error writing {table} snapshot: {str(e)}")
+        drop_snapshot(table, connection_uri)
+
+def drop_snapshot(table, connection_uri=None):
+    path = snapshot_path(table, connection_uri)
+    shutil.rmtree(path, ignore_errors=True)
+    # The database's directory goes with its last table
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+def snapshot_available(table="transactions", connection_uri=None):
+    return snapshot_enabled() and os.path.isdir(snapshot_path(table, connection_uri))
+
+def partitions(table="transactions", connection_uri=None):
+    # {month: file} of the current snapshot
+    path = snapshot_path(table, connection_uri)
+    files = sorted(f for f in os.listdir(path) if f.startswith("month=") and f.endswith(".arrow"))
+    return {f[len("month="):-len(".arrow")]: os.path.join(path, f) for f in files}
+
+def read_table(table="transactions", months=None, columns=None, connection_uri=None):
+    # Arrow table over the memory-mapped partitions; `months` limits the read to those partitions
+    files = partitions(table, connection_uri)
+    if months is not None:
+        files = {month: file for month, file in files.items() if month in months}
+    tables = [_read_ipc(file) for file in files.values()]
+    if not tables:
+        raise FileNotFoundError(f"No {table} snapshot partitions to read.")
+    if columns is not None:
+        tables = [t.select(columns) for t in tables]
+    return pa.concat_tables(tables, promote_options="default")
+
+def read_frame(table="transactions", months=None, columns=None, connection_uri=None):
+    # Arrow-backed pandas columns share the memory-mapped buffers instead of copying them
+    return read_table(table, months, columns, connection_uri).to_pandas(types_mapper=pd.ArrowDtype)
+
+def daily_facts(connection_uri=None):
+    # Same rows as the fact_cube query (rollup_daily), aggregated directly on the mapped columns
+    rows = read_table("transactions", columns=['date', 'account', 'category', 'type', 'amount'], connection_uri=connection_uri)
+    facts = pa.table({
+        'day': pc.cast(rows['date'], pa.date32()),
+        'account': rows['account'],
+        'category': rows['category'],
+        'type': rows['type'],
+        'amount': rows['amount'],
+        # The database's ROUND(), as in rollup_daily: ties to even on PostgreSQL, away from zero otherwise
+        'rounded_amount': pc.round(
+            rows['amount'],
+            round_mode="half_to_even" if rounds_half_to_even(connection_uri) else "half_towards_infinity",
+        ),
+    }).group_by(['day', 'account', 'category', 'type']).aggregate([
+        ('amount', 'sum'),
+        ('rounded_amount', 'sum'),
+        ('amount', 'count', pc.CountOptions(mode="all")),
+    ])
+    df = facts.to_pandas().rename(columns={
+        'amount_sum': 'amount', 'rounded_amount_sum': 'rounded_amount', 'amount_count': 'transactions',
+    })
+    df = df[['day', 'account', 'category', 'type', 'amount', 'rounded_amount', 'transactions']]
+    df.index = range(1, len(df) + 1)
+    return df
+
+def transactions_by_date(date, connection_uri=None):
+    # Same rows as the transactions_by_date query; only the month's partition is read
+    day = pd.Timestamp(date)
+    files = partitions("transactions", connection_uri)
+    month = day.strftime('%Y-%m')
+    if month in files or not files:
+        rows = read_table("transactions", months={month}, connection_uri=connection_uri)
+    else:
+        # A month without rows has no partition: no rows, with the columns of the others (as the query returns)
+        rows = _read_ipc(next(iter(files.values()))).slice(0, 0)
+    start = pa.scalar(day.to_pydatetime(), pa.timestamp("us"))
+    end = pa.scalar((day + pd.Timedelta(days=1)).to_pydatetime(), pa.timestamp("us"))
+    rows = rows.filter(pc.and_(pc.greater_equal(rows['date'], start), pc.less(rows['date'], end)))
+    df = rows.sort_by('date').to_pandas()
+    df.index = range(1, len(df) + 1)
+    return df
+
+# Named queries the snapshot can answer when the database cannot
+SNAPSHOT_QUERIES = {
+    "fact_cube": lambda: daily_facts(),
+    "transactions_by_date": lambda date: transactions_by_date(date),
+}
+
+def snapshot_stats(table="transactions", connection_uri=None):
+    if not snapshot_available(table, connection_uri):
+        return {"available": False}
+    files = partitions(table, connection_uri)
+    return {
+        "available": True,
+        "path": snapshot_path(table, connection_uri),
+        "partitions": len(files),
+        "rows": sum(_read_ipc(file).num_rows for file in files.values()),
+        "bytes": sum(os.path.getsize(file) for file in files.values()),
+    }